@@ -0,0 +1,72 @@
+"""Сериализация постов и комментариев в словари для JSON-ответов.
+
+Для каждого поля известно, какие колонки и связи ему нужны, поэтому
+запрос выбирает ровно то, что клиент попросил в ``?fields=``.
+"""
+
+
+class UnknownFields(ValueError):
+    pass
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+def _group_slug(post):
+    return post.group.slug if post.group_id else None
+
+
+# поле: (колонки для only(), связи для select_related(), значение)
+POST_FIELDS = {
+    'id': ((), (), lambda post: post.id),
+    'text': (('text',), (), lambda post: post.text),
+    'created': ((), (), lambda post: post.created.isoformat()),
+    'author': (('author__username',), ('author',),
+               lambda post: post.author.username),
+    'group': (('group__slug',), ('group',), _group_slug),
+    'image': (('image',), (), _image_url),
+    'comments_count': (('comments_count',), (),
+                       lambda post: post.comments_count),
+}
+COMMENT_FIELDS = {
+    'id': ((), (), lambda comment: comment.id),
+    'text': (('text',), (), lambda comment: comment.text),
+    'created': ((), (), lambda comment: comment.created.isoformat()),
+    'author': (('author__username',), ('author',),
+               lambda comment: comment.author.username),
+    'parent': (('parent',), (), lambda comment: comment.parent_id),
+    'depth': (('depth',), (), lambda comment: comment.depth),
+}
+# Колонки ключа курсора и внешних ключей нужны всегда.
+BASE_COLUMNS = ('id', 'created')
+
+
+def parse_fields(value, available):
+    """Список полей из ``?fields=a,b``; по умолчанию — все поля."""
+    if not value:
+        return list(available)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise UnknownFields('Неизвестные поля: ' + ', '.join(unknown))
+    return fields
+
+
+def optimize(queryset, fields, available):
+    """Ограничивает запрос колонками и связями выбранных полей."""
+    columns, related = set(BASE_COLUMNS), set()
+    for name in fields:
+        field_columns, field_related, _ = available[name]
+        columns.update(field_columns)
+        related.update(field_related)
+    # Пустой select_related() тянул бы все связи, поэтому только с именами.
+    if related:
+        # Связь из select_related нельзя откладывать: её ключ тоже нужен.
+        columns.update(related)
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+def serialize(obj, fields, available):
+    return {name: available[name][2](obj) for name in fields}
@@ -0,0 +1,154 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев',
+                                              last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}',
+                                group=cls.group)
+            for number in range(13)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {number}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_are_cursor_paginated(self):
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:profile_posts',
+                    kwargs={'username': self.author.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).json()
+                self.assertEqual(len(first['results']), 10)
+                self.assertIsNone(first['previous'])
+                second = self.client.get(url, {'after': first['next']})
+                second = second.json()
+                self.assertEqual(
+                    [post['id'] for post in second['results']],
+                    [post.id for post in reversed(self.posts[:3])]
+                )
+                self.assertIsNone(second['next'])
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('api:index'),
+                                   {'fields': 'id,author', 'limit': 2})
+        self.assertEqual(response.json()['results'], [
+            {'id': self.post.id, 'author': 'author'},
+            {'id': self.posts[-2].id, 'author': 'author'},
+        ])
+
+    def test_unknown_field_is_bad_request(self):
+        response = self.client.get(reverse('api:index'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_sparse_fields_select_only_needed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('api:index'), {'fields': 'id,text'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('auth_user', sql)
+        self.assertNotIn('"image"', sql)
+
+    def test_feed_etag_skips_database(self):
+        url = reverse('api:index')
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('ETag'))
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.author, text='Новый пост')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, HTTPStatus.OK)
+
+    def test_feed_etag_changes_with_comments_count(self):
+        url = reverse('api:index')
+        response = self.client.get(url)
+        comment = Comment.objects.create(post=self.post, author=self.author,
+                                         text='Ещё комментарий')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, HTTPStatus.OK)
+        comment.delete()
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=fresh['ETag'])
+        self.assertEqual(again.status_code, HTTPStatus.OK)
+
+    def test_post_detail_with_comments(self):
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.id})
+        response = self.client.get(url, {'limit': 2})
+        data = response.json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(len(data['comments']['results']), 2)
+        rest = self.client.get(
+            reverse('api:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': data['comments']['next']}
+        ).json()
+        self.assertEqual([comment['text'] for comment in rest['results']],
+                         ['Комментарий 0'])
+        cached = self.client.get(url, {'limit': 2},
+                                 HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_profile(self):
+        response = self.client.get(
+            reverse('api:profile', kwargs={'username': 'author'}))
+        self.assertEqual(response.json(), {
+            'username': 'author',
+            'full_name': 'Лев Толстой',
+            'posts': 13,
+            'followers': 1,
+            'following': 0,
+        })
+
+    def test_follow_feed(self):
+        url = reverse('api:follow_feed')
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.UNAUTHORIZED)
+        data = self.reader_client.get(url, {'fields': 'id'}).json()
+        self.assertEqual(data['results'][0], {'id': self.post.id})
+
+    def test_missing_objects(self):
+        urls = (
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile', kwargs={'username': 'missing'}),
+            reverse('api:post_detail', kwargs={'post_id': 0}),
+            reverse('api:post_comments', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIn('detail', response.json())
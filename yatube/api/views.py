@@ -0,0 +1,196 @@
+import hashlib
+import json
+import math
+from http import HTTPStatus
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import etag, require_POST, require_safe
+
+from core.ratelimit import limited
+from posts.cache import ALL_FEEDS, generations
+from posts.feed import feed_page
+from posts.follows import follow_many, unfollow_many
+from posts.models import Group, Post, User
+from posts.stats import get_stats
+from posts.utils import QUANTTIY_OF_POSTS, page_maker
+from .serializers import (COMMENT_FIELDS, POST_FIELDS, UnknownFields,
+                          optimize, parse_fields, serialize)
+
+API_MAX_LIMIT = 100
+FOLLOW_BATCH_LIMIT = 1000
+# Пакет списывает жетон profile_follow за каждые столько имён: самый
+# большой пакет должен помещаться в ведро.
+FOLLOW_BATCH_CHUNK = 20
+
+
+def api_error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def json_response(request, data, conditional=True):
+    """JSON-ответ; с ``conditional`` — с ETag по содержимому и 304."""
+    response = JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+    if not conditional:
+        return response
+    response['ETag'] = quote_etag(hashlib.md5(response.content).hexdigest())
+    return get_conditional_response(request, etag=response['ETag'],
+                                    response=response)
+
+
+def feed_etag(scope):
+    """ETag ленты по номерам поколений кэша: 304 отдаётся без запросов к БД.
+
+    Поколения сбрасываются теми же сигналами, что и HTML-кэш лент.
+    """
+    def etag_func(request, **kwargs):
+        common, own = generations(ALL_FEEDS, scope.format(**kwargs))
+        raw = f'{common}.{own}:{request.get_full_path()}'
+        return hashlib.md5(raw.encode()).hexdigest()
+    return etag_func
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', QUANTTIY_OF_POSTS))
+    except ValueError:
+        limit = QUANTTIY_OF_POSTS
+    return min(max(limit, 1), API_MAX_LIMIT)
+
+
+def page_payload(page, fields, available):
+    return {
+        'results': [serialize(obj, fields, available) for obj in page],
+        'next': page.paginator.next_cursor,
+        'previous': page.paginator.previous_cursor,
+    }
+
+
+def list_response(request, queryset, available, conditional=False):
+    try:
+        fields = parse_fields(request.GET.get('fields'), available)
+    except UnknownFields as error:
+        return api_error(HTTPStatus.BAD_REQUEST, str(error))
+    page = page_maker(request, optimize(queryset, fields, available),
+                      per_page=page_size(request))
+    return json_response(request, page_payload(page, fields, available),
+                         conditional)
+
+
+@require_safe
+@etag(feed_etag('index'))
+def index(request):
+    return list_response(request, Post.objects.all(), POST_FIELDS)
+
+
+@require_safe
+@etag(feed_etag('group:{slug}'))
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return api_error(HTTPStatus.NOT_FOUND, 'Группа не найдена.')
+    return list_response(request, group.posts_of_group.all(), POST_FIELDS)
+
+
+@require_safe
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return api_error(HTTPStatus.NOT_FOUND, 'Автор не найден.')
+    stats = get_stats(author.id)
+    return json_response(request, {
+        'username': author.username,
+        'full_name': author.get_full_name(),
+        'posts': stats.posts,
+        'followers': stats.followers,
+        'following': stats.following,
+    })
+
+
+@require_safe
+@etag(feed_etag('profile:{username}'))
+def profile_posts(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return api_error(HTTPStatus.NOT_FOUND, 'Автор не найден.')
+    return list_response(request, author.posts_of_author.all(), POST_FIELDS)
+
+
+@require_safe
+def follow_feed(request):
+    if not request.user.is_authenticated:
+        return api_error(HTTPStatus.UNAUTHORIZED, 'Нужно войти.')
+    try:
+        fields = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    except UnknownFields as error:
+        return api_error(HTTPStatus.BAD_REQUEST, str(error))
+    page = feed_page(request, request.user, per_page=page_size(request))
+    return json_response(request, page_payload(page, fields, POST_FIELDS))
+
+
+@require_safe
+def post_detail(request, post_id):
+    try:
+        fields = parse_fields(request.GET.get('fields'), POST_FIELDS)
+        comment_fields = parse_fields(request.GET.get('comment_fields'),
+                                      COMMENT_FIELDS)
+    except UnknownFields as error:
+        return api_error(HTTPStatus.BAD_REQUEST, str(error))
+    post = optimize(Post.objects.filter(id=post_id), fields,
+                    POST_FIELDS).first()
+    if post is None:
+        return api_error(HTTPStatus.NOT_FOUND, 'Пост не найден.')
+    comments = page_maker(
+        request,
+        optimize(post.comments.all(), comment_fields, COMMENT_FIELDS),
+        per_page=page_size(request),
+    )
+    data = serialize(post, fields, POST_FIELDS)
+    data['comments'] = page_payload(comments, comment_fields,
+                                    COMMENT_FIELDS)
+    return json_response(request, data)
+
+
+@require_safe
+def post_comments(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        return api_error(HTTPStatus.NOT_FOUND, 'Пост не найден.')
+    comments = Post(id=post_id).comments.all()
+    return list_response(request, comments, COMMENT_FIELDS,
+                         conditional=True)
+
+
+@require_POST
+def follow_batch(request):
+    """Подписки списком: ``{"follow": [имена], "unfollow": [имена]}``."""
+    if not request.user.is_authenticated:
+        return api_error(HTTPStatus.UNAUTHORIZED, 'Нужно войти.')
+    try:
+        payload = json.loads(request.body)
+        follow = list(payload.get('follow', []))
+        unfollow = list(payload.get('unfollow', []))
+        if not all(isinstance(name, str) for name in follow + unfollow):
+            raise TypeError
+    except (ValueError, TypeError, AttributeError):
+        return api_error(HTTPStatus.BAD_REQUEST,
+                         'Ожидаются списки имён follow и unfollow.')
+    if len(follow) + len(unfollow) > FOLLOW_BATCH_LIMIT:
+        return api_error(HTTPStatus.BAD_REQUEST,
+                         f'Не больше {FOLLOW_BATCH_LIMIT} имён за раз.')
+    chunks = math.ceil(len(follow + unfollow) / FOLLOW_BATCH_CHUNK)
+    rejected = limited(request, 'profile_follow', tokens=max(chunks, 1))
+    if rejected:
+        return rejected
+    ids = dict(User.objects.filter(username__in=follow + unfollow)
+               .values_list('username', 'id'))
+    names = {user_id: username for username, user_id in ids.items()}
+    followed = follow_many(request.user,
+                           [ids[name] for name in follow if name in ids])
+    unfollowed = unfollow_many(request.user,
+                               [ids[name] for name in unfollow if name in ids])
+    return JsonResponse({
+        'followed': sorted(names[user_id] for user_id in followed),
+        'unfollowed': sorted(names[user_id] for user_id in unfollowed),
+        'unknown': sorted(set(follow + unfollow) - set(ids)),
+    }, json_dumps_params={'ensure_ascii': False})
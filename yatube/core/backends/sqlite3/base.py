@@ -0,0 +1,39 @@
+"""SQLite с настройкой соединения и режимом транзакций из OPTIONS.
+
+``init_command`` — PRAGMA через «;», выполняются на каждом новом
+соединении. ``transaction_mode`` — чем начинать ``atomic()``: при
+IMMEDIATE блокировка записи берётся сразу на BEGIN, где работает
+busy_timeout. При обычном BEGIN транзакция, которая сначала читает, а
+потом пишет, получает «database is locked» без ожидания, если запись
+уже держит другое соединение.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.init_command = params.pop('init_command', None)
+        mode = params.pop('transaction_mode', None)
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode должен быть одним из '
+                f'{", ".join(TRANSACTION_MODES)}, а не {mode!r}.')
+        self.transaction_mode = mode and mode.upper()
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in (self.init_command or '').split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
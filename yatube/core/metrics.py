@@ -0,0 +1,34 @@
+"""Счётчики процесса: считаем события и стоимость операций."""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_values = defaultdict(float)
+
+
+def incr(name, value=1):
+    with _lock:
+        _values[name] += value
+
+
+def observe(name, value):
+    """Копит сумму, число и максимум наблюдений величины."""
+    with _lock:
+        _values[f'{name}_count'] += 1
+        _values[f'{name}_sum'] += value
+        _values[f'{name}_max'] = max(_values[f'{name}_max'], value)
+
+
+def set_gauge(name, value):
+    with _lock:
+        _values[name] = value
+
+
+def snapshot():
+    with _lock:
+        return dict(sorted(_values.items()))
+
+
+def reset():
+    with _lock:
+        _values.clear()
@@ -0,0 +1,114 @@
+"""Выборочный журнал SQL-запросов для советчика индексов.
+
+Доля ``QUERY_SAMPLE_RATE`` запросов к сайту пишет свои SELECT с
+параметрами и временем в ``QUERY_SAMPLE_LOG``, по JSON на строку.
+Записи и обновления не пишутся вовсе: в них пароли и тексты
+пользователей. У запросов с условиями на ``PRIVATE_TABLES`` вместо
+параметров пишется null — ключи сессий и данные учётных записей в
+журнал не попадают. При нулевой доле middleware ничего не делает,
+кроме одного сравнения.
+"""
+import json
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+_write_lock = threading.Lock()
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER_RE = re.compile(r'(?<![\w"])\d+(?![\w"])')
+SPACE_RE = re.compile(r'\s+')
+PRIVATE_TABLES = ('django_session', 'auth_user')
+
+
+def normalize(sql):
+    """Форма запроса: списки IN и числа-литералы свёрнуты, пробелы сжаты.
+
+    Запросы одной формы отличаются только параметрами.
+    """
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = NUMBER_RE.sub('N', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def _param(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _private(sql):
+    """Могут ли параметры запроса относиться к ``PRIVATE_TABLES``.
+
+    Параметры стоят в условиях после WHERE; таблицу, упомянутую только
+    в списке столбцов и JOIN, запрос не фильтрует.
+    """
+    names = [f'"{table}"' for table in PRIVATE_TABLES]
+    if not any(name in sql for name in names):
+        return False
+    head, _, conditions = sql.partition(' WHERE ')
+    return '%s' in head or any(name in conditions for name in names)
+
+
+def _params(sql, params, many):
+    if many or _private(sql):
+        return None
+    return [_param(value) for value in params or ()]
+
+
+def write_samples(path, samples):
+    """Дописывает записи одним write: строки процессов не перемешаются."""
+    lines = ''.join(json.dumps(sample, ensure_ascii=False) + '\n'
+                    for sample in samples)
+    with _write_lock, open(path, 'a', encoding='utf-8') as log:
+        log.write(lines)
+
+
+def read_samples(path):
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            if line.strip():
+                yield json.loads(line)
+
+
+class QuerySampleMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = getattr(settings, 'QUERY_SAMPLE_RATE', 0)
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+        samples = []
+
+        def wrapper(execute, sql, params, many, context):
+            if not sql.lstrip().upper().startswith('SELECT'):
+                return execute(sql, params, many, context)
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                samples.append({
+                    'sql': sql,
+                    'params': _params(sql, params, many),
+                    'ms': round((time.perf_counter() - started) * 1000, 3),
+                    'db': context['connection'].alias,
+                })
+
+        # Запрос может читать с реплики: слушаем все базы, не только default.
+        with ExitStack() as stack:
+            for db in connections.all():
+                stack.enter_context(db.execute_wrapper(wrapper))
+            response = self.get_response(request)
+        if samples:
+            match = request.resolver_match
+            view = match.view_name if match else request.path
+            for sample in samples:
+                sample['view'] = view
+            write_samples(settings.QUERY_SAMPLE_LOG, samples)
+        return response
@@ -0,0 +1,95 @@
+"""Ограничение частоты записей на кэше Django.
+
+Ведро на ``capacity`` жетонов наполняется целиком за ``period`` секунд.
+Остаток жетонов не хранится — это потребовало бы чтения и записи под
+блокировкой. Вместо этого потраченные жетоны считаются атомарным
+``incr`` в окнах длиной ``period``, а граница окна сглаживается долей
+предыдущего, как у скользящего окна: одна проверка — это ``incr`` и
+``get`` без гонок между процессами.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .views import too_many_requests
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+RATE_KEY = 'ratelimit:{}:{}:{}'
+
+
+def parse_rate(rate):
+    """``'10/m'`` или ``'100/5m'`` в (жетонов, секунд)."""
+    count, period = rate.split('/')
+    return int(count), int(period[:-1] or 1) * PERIODS[period[-1]]
+
+
+def client_key(request):
+    """Чьё ведро: пользователя, а для анонима — адреса."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def _take(key, timeout, tokens):
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key, tokens)
+    except ValueError:
+        # Ключ вытеснили между add и incr.
+        cache.set(key, tokens, timeout)
+        return tokens
+
+
+def hit(scope, identity, capacity, period, now=None, tokens=1):
+    """Берёт жетоны из ведра. Возвращает (можно ли, через сколько секунд)."""
+    now = time.time() if now is None else now
+    window, elapsed = divmod(now / period, 1)
+    key = RATE_KEY.format(scope, identity, int(window))
+    used = _take(key, period * 2, tokens)
+    previous = cache.get(RATE_KEY.format(scope, identity, int(window) - 1),
+                         0)
+    if previous * (1 - elapsed) + used <= capacity:
+        return True, 0
+    # Отказ жетон не тратит, иначе настойчивый клиент не дождётся ведра.
+    try:
+        cache.decr(key, tokens)
+    except ValueError:
+        # Окно вытеснили после incr: возвращать жетон некуда.
+        pass
+    return False, math.ceil(period * (1 - elapsed))
+
+
+def limited(request, scope, tokens=1):
+    """Ответ 429, если клиенту не хватает ``tokens`` жетонов, иначе None.
+
+    Лимит берётся из ``settings.RATE_LIMITS[scope]``, например ``'10/m'``;
+    без записи в настройках запрос не ограничивается.
+    """
+    rate = settings.RATE_LIMITS.get(scope)
+    if not rate:
+        return None
+    capacity, period = parse_rate(rate)
+    allowed, retry_after = hit(scope, client_key(request), capacity, period,
+                               tokens=tokens)
+    if allowed:
+        return None
+    metrics.incr(f'ratelimit_{scope}_rejected')
+    return too_many_requests(request, retry_after)
+
+
+def rate_limit(scope, methods=('POST',)):
+    """Отклоняет лишние запросы к view до валидации форм и работы с БД."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                rejected = limited(request, scope)
+                if rejected:
+                    return rejected
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
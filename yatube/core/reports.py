@@ -0,0 +1,18 @@
+"""Вывод отчётов команд замеров."""
+import json
+
+
+def write_json(stdout, report, json_path):
+    """Пишет отчёт JSON-ом в файл или, для «-», в stdout команды.
+
+    Возвращает False без ``json_path``: тогда команда печатает таблицу.
+    """
+    if not json_path:
+        return False
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if json_path == '-':
+        stdout.write(text)
+    else:
+        with open(json_path, 'w', encoding='utf-8') as output:
+            output.write(text + '\n')
+    return True
@@ -0,0 +1,101 @@
+"""Чтение ленты и страниц постов с реплик базы.
+
+Реплики из ``REPLICA_DATABASES`` — копии default, которые отстают от
+неё; локально это скопированный файл SQLite, его обновляет команда
+``sync_replicas``. ``ReplicaMiddleware`` включает чтение с реплики для
+GET-запросов к ``REPLICA_READ_VIEWS``. Запись, чтение внутри
+транзакции и все остальные страницы идут в default. После
+``REPLICA_STICKY_VIEWS`` пользователь ``REPLICA_STICKY_SECONDS`` секунд
+читает только из default и видит свои записи, пока реплика догоняет.
+Отметка об этом едет в подписанной cookie, поэтому её видит любой
+процесс веб-сервера, а не только тот, что принял запись.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'replica_pin'
+STICKY_SALT = 'core.routers.sticky'
+
+_state = threading.local()
+
+
+def replica_alias():
+    """Реплика, с которой читает текущий запрос, или None."""
+    return getattr(_state, 'alias', None)
+
+
+def pin_to_primary(response, user_id):
+    response.set_signed_cookie(
+        STICKY_COOKIE, str(user_id), salt=STICKY_SALT,
+        max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+        samesite='Lax')
+
+
+def pinned(request):
+    """Читает ли пользователь запроса только из default.
+
+    Подпись хранит время выдачи, так что срок проверяется и на сервере.
+    """
+    if not request.user.is_authenticated:
+        return False
+    user_id = request.get_signed_cookie(
+        STICKY_COOKIE, default=None, salt=STICKY_SALT,
+        max_age=settings.REPLICA_STICKY_SECONDS)
+    return user_id == str(request.user.id)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if (alias is None
+                or model._meta.app_label not in settings.REPLICA_READ_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Без явного ответа Django пишет туда, откуда прочитан объект.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Ставится после AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.alias = None
+        match = request.resolver_match
+        if (match and match.view_name in settings.REPLICA_STICKY_VIEWS
+                and request.user.is_authenticated
+                and response.status_code < 400):
+            pin_to_primary(response, request.user.id)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = list(settings.REPLICA_DATABASES)
+        if (not replicas or request.method not in ('GET', 'HEAD')
+                or request.resolver_match.view_name
+                not in settings.REPLICA_READ_VIEWS):
+            return None
+        # request.user читается здесь, до переключения, — из default:
+        # только что созданной сессии на реплике ещё может не быть.
+        if pinned(request):
+            return None
+        _state.alias = random.choice(replicas)
+        return None
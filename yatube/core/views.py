@@ -1,7 +1,11 @@
+from django.contrib.auth.decorators import user_passes_test
+from django.http import HttpResponse
 from django.shortcuts import render
 
 from http import HTTPStatus
 
+from . import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html',
@@ -15,3 +19,17 @@ def csrf_failure(request, reason=''):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=HTTPStatus.FORBIDDEN)
+
+
+def too_many_requests(request, retry_after):
+    response = render(request, 'core/429.html',
+                      {'retry_after': retry_after},
+                      status=HTTPStatus.TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+@user_passes_test(lambda user: user.is_staff)
+def metrics_view(request):
+    lines = [f'{name} {value:g}' for name, value in metrics.snapshot().items()]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain')
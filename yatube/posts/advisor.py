@@ -0,0 +1,222 @@
+"""Советчик индексов по журналу запросов ``core.querylog``.
+
+Запросы группируются по форме. Для формы, чей план сканирует таблицу
+или сортирует во временном B-дереве, индекс-кандидат собирается из
+условий WHERE и ORDER BY: сначала столбцы равенства, затем столбцы
+сортировки, а без сортировки — столбец диапазона. Кандидат создаётся
+в транзакции, которая потом откатывается: так видно, чинит ли он план
+и сколько экономит на самом медленном запросе формы.
+"""
+import re
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.migrations import AddIndex, Migration
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from core.querylog import normalize
+
+from . import plans
+
+COLUMN = r'"(\w+)"\."(\w+)"'
+EQUAL_RE = re.compile(COLUMN + r' (?:= %s|IN \()')
+RANGE_RE = re.compile(COLUMN + r' (?:<|>|<=|>=) %s')
+ORDER_RE = re.compile(COLUMN + r' (?:ASC|DESC)')
+PLAN_TABLE_RE = re.compile(r'^(?:SCAN|SEARCH) (\w+)')
+
+
+class Rollback(Exception):
+    pass
+
+
+def group_shapes(samples):
+    """Формы SELECT из журнала, самые затратные первыми.
+
+    Представитель формы — её самый медленный запрос.
+    """
+    shapes = {}
+    for sample in samples:
+        select = sample['sql'].lstrip().upper().startswith('SELECT')
+        if not select or sample.get('params') is None:
+            continue
+        shape = normalize(sample['sql'])
+        group = shapes.setdefault(shape, {
+            'shape': shape, 'calls': 0, 'total_ms': 0.0,
+            'views': Counter(), 'sample': sample,
+        })
+        group['calls'] += 1
+        group['total_ms'] += sample['ms']
+        group['views'][sample['view']] += 1
+        if sample['ms'] > group['sample']['ms']:
+            group['sample'] = sample
+    return sorted(shapes.values(), key=lambda group: -group['total_ms'])
+
+
+def _order_clause(sql):
+    head, _, tail = sql.rpartition(' ORDER BY ')
+    return tail if head else ''
+
+
+def candidate(sql, table):
+    """Столбцы индекса-кандидата для ``table`` или пустой кортеж."""
+    order_by = ORDER_RE.findall(_order_clause(sql))
+    order = [column for owner, column in order_by]
+    if {owner for owner, _ in order_by} - {table}:
+        # Сортировка по нескольким таблицам индексом не решается.
+        order = []
+    columns = []
+    for owner, column in EQUAL_RE.findall(sql):
+        # Равенство из условия курсора относится к сортировке.
+        if owner == table and column not in order and column not in columns:
+            columns.append(column)
+    if order:
+        columns += order
+    else:
+        columns += [column for owner, column in RANGE_RE.findall(sql)
+                    if owner == table and column not in columns][:1]
+    return tuple(columns)
+
+
+def existing_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [tuple(info['columns']) for info in constraints.values()
+            if info['index'] or info['unique'] or info['primary_key']]
+
+
+def problem_tables(sql, plan):
+    """Таблицы плохих шагов плана; сортировке приписываются ORDER BY.
+
+    Сверх ``plans.problems`` плохим считается и проход по всему индексу
+    таблицы, на которую есть условие равенства: строки отбрасываются
+    одна за другой, пока не наберётся LIMIT.
+    """
+    tables = set()
+    for detail in plans.problems(plan, sql=sql):
+        match = PLAN_TABLE_RE.match(detail)
+        if match:
+            tables.add(match.group(1))
+        else:
+            tables.update(owner for owner, _ in ORDER_RE.findall(
+                _order_clause(sql)))
+    filtered = {owner for owner, _ in EQUAL_RE.findall(sql)}
+    for detail in plan:
+        match = plans.SCAN_RE.match(detail)
+        if match and match.group(1) in filtered:
+            tables.add(match.group(1))
+    return tables
+
+
+def timed(sql, params, repeat):
+    """Лучшее время запроса из ``repeat`` прогонов, мс."""
+    best = None
+    with connection.cursor() as cursor:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def try_index(table, columns, sql, params, repeat):
+    """План и время запроса с временным индексом; индекс не остаётся."""
+    quote = connection.ops.quote_name
+    result = {}
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE INDEX {quote("advisor_candidate")} ON '
+                    f'{quote(table)} '
+                    f'({", ".join(quote(column) for column in columns)})')
+            plan = plans.explain(sql, params)
+            result['plan'] = plan
+            result['fixed'] = table not in problem_tables(sql, plan)
+            result['after_ms'] = timed(sql, params, repeat)
+            raise Rollback
+    except Rollback:
+        pass
+    return result
+
+
+def advise(samples, repeat=5):
+    """Формы запросов журнала и индексы-кандидаты с оценкой выгоды."""
+    shapes = group_shapes(samples)
+    total_ms = sum(shape['total_ms'] for shape in shapes) or 1
+    candidates = {}
+    for shape in shapes:
+        sql, params = shape['sample']['sql'], shape['sample']['params']
+        plan = plans.explain(sql, params)
+        tables = problem_tables(sql, plan)
+        shape['plan'] = plan
+        shape['problems'] = sorted(tables)
+        for table in sorted(tables):
+            columns = candidate(sql, table)
+            if not columns or any(
+                    index[:len(columns)] == columns
+                    for index in existing_indexes(table)):
+                continue
+            key = (table, columns)
+            if key not in candidates:
+                candidates[key] = {'table': table, 'columns': columns,
+                                   'shapes': [], 'saved_ms': 0.0,
+                                   'fixed': True}
+            before_ms = timed(sql, params, repeat)
+            trial = try_index(table, columns, sql, params, repeat)
+            entry = candidates[key]
+            entry['fixed'] = entry['fixed'] and trial['fixed']
+            entry['shapes'].append(shape['shape'])
+            # Доля, сэкономленная на представителе, от времени всей формы.
+            if before_ms:
+                entry['saved_ms'] += shape['total_ms'] * max(
+                    0.0, 1 - trial['after_ms'] / before_ms)
+    for entry in candidates.values():
+        entry['saved_share'] = round(entry['saved_ms'] / total_ms, 3)
+        entry['saved_ms'] = round(entry['saved_ms'], 3)
+    return shapes, sorted(candidates.values(),
+                          key=lambda entry: -entry['saved_ms'])
+
+
+def model_index(table, columns):
+    """Модель проекта и ``models.Index`` для столбцов или (None, None)."""
+    for model in apps.get_models():
+        if model._meta.db_table != table:
+            continue
+        if not model._meta.app_config.path.startswith(settings.BASE_DIR):
+            return None, None
+        by_column = {field.column: field.name
+                     for field in model._meta.concrete_fields}
+        if not all(column in by_column for column in columns):
+            return None, None
+        index = models.Index(fields=[by_column[column]
+                                     for column in columns])
+        index.set_name_with_model(model)
+        return model, index
+    return None, None
+
+
+def migrations_for(candidates):
+    """MigrationWriter по приложению с AddIndex для каждого кандидата."""
+    operations = {}
+    for entry in candidates:
+        model, index = model_index(entry['table'], entry['columns'])
+        if model is not None:
+            operations.setdefault(model._meta.app_label, []).append(
+                AddIndex(model_name=model._meta.model_name, index=index))
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    writers = []
+    for app_label, app_operations in operations.items():
+        leaves = loader.graph.leaf_nodes(app_label)
+        number = max((int(name[:4]) for _, name in leaves
+                      if name[:4].isdigit()), default=0) + 1
+        migration = Migration(f'{number:04d}_advised_indexes', app_label)
+        migration.dependencies = leaves
+        migration.operations = app_operations
+        writers.append(MigrationWriter(migration))
+    return writers
@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import replica_alias
+
+ALL_FEEDS = 'feeds'
+GENERATION_KEY = 'feed_generation:{}'
+
+
+def _new_generation():
+    # Номер от времени, а не с единицы: если счётчик вытеснили из кэша,
+    # новое поколение не совпадёт со старыми закэшированными страницами.
+    return int(time.time() * 1000)
+
+
+def generations(*scopes):
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _new_generation(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump(*scopes):
+    """Делает устаревшими все закэшированные страницы перечисленных лент."""
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def post_scopes(post, *group_slugs):
+    """Ленты, на которых показывается пост."""
+    scopes = ['index', f'profile:{post.author.username}']
+    scopes += [f'group:{slug}' for slug in group_slugs if slug]
+    return scopes
+
+
+def feed_cache(request, scope):
+    """Ключ и время жизни кэша списка постов ленты ``scope``.
+
+    Кэшируется только общий для всех список с паджинатором — тегом
+    ``{% cache %}`` в шаблоне; шапка, кнопка подписки и рекомендации
+    рисуются на каждый запрос. Ключ включает номер поколения ленты и
+    общий номер всех лент, поэтому сброс — это один ``incr`` без
+    перебора ключей.
+    """
+    common, own = generations(ALL_FEEDS, scope)
+    cursor = f'{request.GET.get("after", "")}:{request.GET.get("before", "")}'
+    timeout, source = settings.FEED_CACHE_TIMEOUT, ''
+    if replica_alias():
+        # Список с отстающей реплики живёт недолго и отдельно:
+        # автор, читающий из default, его не получит.
+        timeout, source = settings.REPLICA_STICKY_SECONDS, ':replica'
+    return {'key': f'{scope}:{common}.{own}:{cursor}{source}',
+            'timeout': timeout}
@@ -0,0 +1,250 @@
+import heapq
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from core import metrics
+from .models import AuthorStats, FeedEntry, Follow, Post
+from .utils import (QUANTTIY_OF_POSTS, CursorPaginator, encode_cursor,
+                    keyset_filter)
+
+FEED_BACKFILL_SIZE = 500
+FEED_BATCH_SIZE = 1000
+FEED_KEYS = ('created', 'post_id')
+PULL_AUTHORS_CACHE_KEY = 'feed:pull_authors'
+PULL_AUTHORS_TIMEOUT = 60 * 5
+
+
+def pull_author_ids():
+    """Авторы, чьи посты не раскладываются, а подмешиваются при чтении.
+
+    Набор кэшируется на ``PULL_AUTHORS_TIMEOUT``: после смены режима
+    автора чтение видит её с этой задержкой. Запись смотрит режим в базе.
+    """
+    metrics.set_gauge('feed_pull_threshold', settings.FEED_PULL_THRESHOLD)
+    author_ids = cache.get(PULL_AUTHORS_CACHE_KEY)
+    if author_ids is None:
+        author_ids = set(
+            AuthorStats.objects.filter(pulled_since__isnull=False)
+            .values_list('author_id', flat=True)
+        )
+        cache.set(PULL_AUTHORS_CACHE_KEY, author_ids, PULL_AUTHORS_TIMEOUT)
+    metrics.set_gauge('feed_pull_authors', len(author_ids))
+    return author_ids
+
+
+def is_pulled(author_id):
+    return AuthorStats.objects.filter(author_id=author_id,
+                                      pulled_since__isnull=False).exists()
+
+
+def _bulk_add(entries):
+    FeedEntry.objects.bulk_create(entries, batch_size=FEED_BATCH_SIZE,
+                                  ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    if is_pulled(post.author_id):
+        metrics.incr('feed_fan_out_skipped')
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .values_list('user_id', flat=True))
+    _bulk_add(
+        FeedEntry(user_id=user_id, post_id=post.id, created=post.created)
+        for user_id in followers.iterator()
+    )
+
+
+def _backfill(user_id, author_id):
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('id', 'created')[:FEED_BACKFILL_SIZE])
+    _bulk_add(
+        FeedEntry(user_id=user_id, post_id=post_id, created=created)
+        for post_id, created in posts
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя последние посты нового автора."""
+    if not is_pulled(author_id):
+        _backfill(user_id, author_id)
+
+
+def backfill_many(user_id, author_ids):
+    """``backfill`` для многих авторов сразу, одним запросом к постам.
+
+    Последние ``FEED_BACKFILL_SIZE`` постов каждого автора отбирает
+    оконная функция.
+    """
+    author_ids = set(author_ids) - set(
+        AuthorStats.objects.filter(author_id__in=author_ids,
+                                   pulled_since__isnull=False)
+        .values_list('author_id', flat=True))
+    if not author_ids:
+        return
+    ranked = (Post.objects.filter(author_id__in=author_ids).order_by()
+              .annotate(author_rank=Window(
+                  RowNumber(), partition_by=[F('author_id')],
+                  order_by=[F('created').desc(), F('id').desc()]))
+              .values('id', 'created', 'author_rank'))
+    sql, params = ranked.query.sql_with_params()
+    posts = Post.objects.raw(
+        f'SELECT id, created FROM ({sql}) WHERE author_rank <= %s',
+        [*params, FEED_BACKFILL_SIZE])
+    _bulk_add(
+        FeedEntry(user_id=user_id, post_id=post.id, created=post.created)
+        for post in posts
+    )
+
+
+def _push_missed(author_id, pulled_since):
+    """Раскладывает то, что автор пропустил, пока подмешивался.
+
+    Подписавшимся за это время достаётся обычный backfill, остальным —
+    посты, опубликованные с ``pulled_since``.
+    """
+    followers = (Follow.objects.filter(author_id=author_id)
+                 .values_list('user_id', flat=True))
+    seen = FeedEntry.objects.filter(post__author_id=author_id)
+    for user_id in followers.exclude(
+            user_id__in=seen.values('user_id')).iterator():
+        _backfill(user_id, author_id)
+    posts = list(Post.objects.filter(author_id=author_id,
+                                     created__gte=pulled_since)
+                 .values_list('id', 'created')[:FEED_BACKFILL_SIZE])
+    if posts:
+        _bulk_add(
+            FeedEntry(user_id=user_id, post_id=post_id, created=created)
+            for user_id in followers.iterator()
+            for post_id, created in posts
+        )
+
+
+def _switch(changed, to_pull):
+    switched = 0
+    for author_id, pulled_since in changed.values_list('author_id',
+                                                       'pulled_since'):
+        # Условие на старое значение: режим меняет только один процесс.
+        claimed = AuthorStats.objects.filter(
+            author_id=author_id, pulled_since=pulled_since)
+        if to_pull:
+            switched += claimed.update(pulled_since=timezone.now())
+        elif claimed.update(pulled_since=None):
+            switched += 1
+            _push_missed(author_id, pulled_since)
+    if switched:
+        cache.delete(PULL_AUTHORS_CACHE_KEY)
+    return switched
+
+
+def sync_modes(author_ids=None):
+    """Переводит в подмешивание авторов, набравших ``FEED_PULL_THRESHOLD``.
+
+    Вызывается после новых подписок; переход только запоминает время,
+    поэтому дёшев и годится для запроса.
+    """
+    changed = AuthorStats.objects.filter(
+        pulled_since__isnull=True, followers__gte=settings.FEED_PULL_THRESHOLD)
+    if author_ids is not None:
+        changed = changed.filter(author_id__in=author_ids)
+    return _switch(changed, to_pull=True)
+
+
+def push_back(author_ids=None):
+    """Возвращает к раскладке авторов, растерявших подписчиков.
+
+    Порог возврата — доля ``FEED_PUSH_RATIO`` от ``FEED_PULL_THRESHOLD``:
+    автор, колеблющийся около порога, не переключается туда и обратно.
+    Пропущенные посты раскладываются по лентам всех подписчиков, а это
+    миллионы строк, поэтому вызывается только из команды
+    ``sync_feed_modes``, не из запроса. До неё автор подмешивается.
+    """
+    threshold = int(settings.FEED_PULL_THRESHOLD * settings.FEED_PUSH_RATIO)
+    changed = AuthorStats.objects.filter(pulled_since__isnull=False,
+                                         followers__lt=threshold)
+    if author_ids is not None:
+        changed = changed.filter(author_id__in=author_ids)
+    return _switch(changed, to_pull=False)
+
+
+def rebuild(user_ids):
+    """Собирает ленты читателей заново по их подпискам."""
+    user_ids = list(user_ids)
+    FeedEntry.objects.filter(user_id__in=user_ids).delete()
+    follows = (Follow.objects.filter(user_id__in=user_ids)
+               .values_list('user_id', 'author_id'))
+    pulled = set(AuthorStats.objects.filter(pulled_since__isnull=False)
+                 .values_list('author_id', flat=True))
+    for user_id, author_id in follows.iterator():
+        if author_id not in pulled:
+            _backfill(user_id, author_id)
+
+
+def trim(user_id, *author_ids):
+    """Убирает из ленты читателя посты авторов, от которых он отписался."""
+    FeedEntry.objects.filter(user_id=user_id,
+                             post__author_id__in=author_ids).delete()
+
+
+class FeedPaginator(CursorPaginator):
+    """Лента подписок: разложенные записи плюс посты «тянущихся» авторов.
+
+    Каждый источник отдаёт не больше страницы по своему индексу,
+    после чего списки сливаются k-way merge по (created, id).
+    """
+
+    def __init__(self, user, pulled_author_ids, per_page, after=None,
+                 before=None):
+        entries = FeedEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group')
+        super().__init__(entries, per_page, after, before, keys=FEED_KEYS)
+        self.pulled_author_ids = pulled_author_ids
+
+    def cursor_for(self, post):
+        return encode_cursor(post.created, post.id)
+
+    def _fetch(self, cursor, backwards):
+        started = time.monotonic()
+        limit = self.per_page + 1
+        sources = [[entry.post for entry in super()._fetch(cursor,
+                                                           backwards)]]
+        for author_id in self.pulled_author_ids:
+            posts = keyset_filter(
+                Post.objects.filter(author_id=author_id)
+                .select_related('author', 'group'),
+                cursor, backwards
+            )
+            sources.append(list(posts[:limit]))
+        merged = heapq.merge(*sources, key=lambda post: (post.created,
+                                                         post.id),
+                             reverse=not backwards)
+        rows, seen = [], set()
+        for post in merged:
+            if post.id not in seen:
+                seen.add(post.id)
+                rows.append(post)
+            if len(rows) == limit:
+                break
+        metrics.observe('feed_merge_sources', len(sources))
+        metrics.observe('feed_merge_rows', sum(map(len, sources)))
+        metrics.observe('feed_merge_seconds', time.monotonic() - started)
+        return rows
+
+
+def feed_page(request, user, per_page=QUANTTIY_OF_POSTS):
+    """Страница ленты подписок пользователя."""
+    pull_ids = pull_author_ids()
+    pulled = []
+    if pull_ids:
+        pulled = list(Follow.objects.filter(user=user,
+                                            author_id__in=pull_ids)
+                      .values_list('author_id', flat=True))
+    paginator = FeedPaginator(user, pulled, per_page,
+                              after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+    return paginator.page()
@@ -0,0 +1,78 @@
+"""Массовые подписки и отписки одним набором запросов.
+
+При bulk-операциях сигналы Follow не срабатывают, поэтому счётчики,
+режим ленты, ленты, кэш профилей и граф подписок обновляются здесь же,
+пачкой, — всё, что делают обработчики в ``signals``.
+"""
+from django.db import connection, transaction
+
+from . import cache, feed, graph, stats
+from .models import AuthorStats, Follow, User
+
+
+def _bump_followers(author_ids, delta):
+    updated = AuthorStats.objects.filter(author_id__in=author_ids).update(
+        **stats.clamped(followers=delta))
+    if delta > 0 and updated < len(author_ids):
+        counted = set(AuthorStats.objects.filter(author_id__in=author_ids)
+                      .values_list('author_id', flat=True))
+        for author_id in author_ids - counted:
+            stats.recount(author_id)
+
+
+def _bump_profiles(author_ids):
+    usernames = (User.objects.filter(id__in=author_ids)
+                 .values_list('username', flat=True))
+    cache.bump(*(f'profile:{username}' for username in usernames))
+
+
+def _delete_follows(user_id, author_ids):
+    table = connection.ops.quote_name(Follow._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE user_id = %s '
+            f'AND author_id IN ({placeholders})',
+            [user_id, *author_ids])
+
+
+def follow_many(user, author_ids):
+    """Подписывает читателя на авторов, возвращает id новых подписок."""
+    author_ids = set(author_ids) - {user.id}
+    with transaction.atomic():
+        existing = set(Follow.objects.filter(user=user,
+                                             author_id__in=author_ids)
+                       .values_list('author_id', flat=True))
+        new_ids = author_ids - existing
+        if not new_ids:
+            return new_ids
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id) for author_id in new_ids],
+            ignore_conflicts=True)
+        _bump_followers(new_ids, 1)
+        stats.bump(user.id, following=len(new_ids))
+    feed.sync_modes(new_ids)
+    feed.backfill_many(user.id, new_ids)
+    for author_id in new_ids:
+        graph.on_follow(user.id, author_id)
+    _bump_profiles(new_ids)
+    return new_ids
+
+
+def unfollow_many(user, author_ids):
+    """Отписывает читателя от авторов, возвращает id снятых подписок."""
+    with transaction.atomic():
+        follows = Follow.objects.filter(user=user, author_id__in=author_ids)
+        removed = set(follows.values_list('author_id', flat=True))
+        if not removed:
+            return removed
+        # На Follow никто не ссылается, так что удаляем одним DELETE
+        # без выборки строк и сигналов на каждую.
+        _delete_follows(user.id, removed)
+        _bump_followers(removed, -1)
+        stats.bump(user.id, following=-len(removed))
+    feed.trim(user.id, *removed)
+    for author_id in removed:
+        graph.on_follow(user.id, author_id, following=False)
+    _bump_profiles(removed)
+    return removed
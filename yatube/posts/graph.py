@@ -0,0 +1,209 @@
+"""Граф подписок в памяти процесса и рекомендации «кого почитать».
+
+Подписки лежат в виде CSR: ``targets`` — id авторов подряд,
+отсортированные по читателю, а ``offsets[u]:offsets[u + 1]`` — срез
+авторов читателя ``u``. Два плоских массива int занимают по 4 байта на
+подписку и обходятся без объектов Python. Граф строится одним проходом
+по Follow, а подписки и отписки после загрузки ложатся в небольшие
+наборы поверх массивов.
+
+Запрос строит граф сам только первый раз в процессе. Устаревший граф
+перечитывается в фоновом потоке, а запросы тем временем читают прежний.
+"""
+import heapq
+import logging
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+
+from .models import Follow, User
+
+logger = logging.getLogger(__name__)
+
+GRAPH_TTL = 60 * 10
+SUGGESTIONS_LIMIT = 5
+SUGGESTIONS_KEY = 'suggestions:{}'
+SUGGESTIONS_TIMEOUT = 60 * 60 * 24
+
+_lock = threading.Lock()
+_graph = None
+_loaded_at = 0
+_loading = False
+# Подписки, пришедшие, пока граф грузится: их дописывают в новый граф.
+_pending = []
+
+
+class FollowGraph:
+    def __init__(self, offsets, targets):
+        self.offsets = offsets
+        self.targets = targets
+        self.added = defaultdict(set)
+        self.removed = defaultdict(set)
+
+    @classmethod
+    def load(cls):
+        """Строит граф одним упорядоченным проходом по подпискам."""
+        max_id = User.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        offsets = array('i', bytes(4 * (max_id + 2)))
+        targets = array('i')
+        follows = (Follow.objects.order_by('user_id', 'author_id')
+                   .values_list('user_id', 'author_id'))
+        for user_id, author_id in follows.iterator():
+            targets.append(author_id)
+            offsets[user_id + 1] += 1
+        for user_id in range(max_id + 1):
+            offsets[user_id + 1] += offsets[user_id]
+        return cls(offsets, targets)
+
+    def following(self, user_id):
+        """Авторы читателя: срез массива или множество, если были правки."""
+        if user_id + 1 < len(self.offsets):
+            start, end = self.offsets[user_id], self.offsets[user_id + 1]
+            authors = self.targets[start:end]
+        else:
+            authors = ()
+        if user_id in self.added or user_id in self.removed:
+            return ((set(authors) - self.removed[user_id])
+                    | self.added[user_id])
+        return authors
+
+    def follow(self, user_id, author_id):
+        self.removed[user_id].discard(author_id)
+        self.added[user_id].add(author_id)
+
+    def unfollow(self, user_id, author_id):
+        self.added[user_id].discard(author_id)
+        self.removed[user_id].add(author_id)
+
+    def suggest(self, user_id, limit=SUGGESTIONS_LIMIT):
+        """Авторы, которых читают авторы читателя: [(id, сколько читают)]."""
+        following = self.following(user_id)
+        counts = Counter()
+        for author_id in following:
+            counts.update(self.following(author_id))
+        for author_id in (*following, user_id):
+            counts.pop(author_id, None)
+        return heapq.nsmallest(limit, counts.items(),
+                               key=lambda item: (-item[1], item[0]))
+
+
+def _apply(follow_graph, user_id, author_id, following):
+    if following:
+        follow_graph.follow(user_id, author_id)
+    else:
+        follow_graph.unfollow(user_id, author_id)
+
+
+def _claim_load():
+    """Право загрузить граф; False, если его уже грузит другой поток."""
+    global _loading
+    with _lock:
+        if _loading:
+            return False
+        _loading = True
+        _pending.clear()
+        return True
+
+
+def _load():
+    """Строит граф без блокировки и подменяет им текущий."""
+    global _graph, _loaded_at, _loading
+    follow_graph = None
+    try:
+        follow_graph = FollowGraph.load()
+    finally:
+        with _lock:
+            if follow_graph is not None:
+                for change in _pending:
+                    _apply(follow_graph, *change)
+                _graph, _loaded_at = follow_graph, time.monotonic()
+            _pending.clear()
+            _loading = False
+    return follow_graph
+
+
+def _load_in_background():
+    try:
+        _load()
+    except Exception:
+        logger.exception('Не удалось перечитать граф подписок')
+    finally:
+        connection.close()
+
+
+def get_graph():
+    """Граф процесса или None, пока первую загрузку ведёт другой поток."""
+    follow_graph = _graph
+    if follow_graph is None:
+        return _load() if _claim_load() else None
+    if time.monotonic() - _loaded_at > GRAPH_TTL and _claim_load():
+        threading.Thread(target=_load_in_background, daemon=True).start()
+    return follow_graph
+
+
+def refresh():
+    """Перечитывает граф сразу, например после засева данных."""
+    _claim_load()
+    return _load()
+
+
+def reset():
+    global _graph
+    with _lock:
+        _graph = None
+
+
+def on_follow(user_id, author_id, following=True):
+    """Отражает подписку или отписку в уже загруженном графе."""
+    cache.delete(SUGGESTIONS_KEY.format(user_id))
+    with _lock:
+        if _loading:
+            _pending.append((user_id, author_id, following))
+        if _graph is not None:
+            _apply(_graph, user_id, author_id, following)
+
+
+def suggestions(user_id, limit=SUGGESTIONS_LIMIT):
+    """Рекомендации: заранее посчитанные командой или прямо из графа."""
+    suggested = cache.get(SUGGESTIONS_KEY.format(user_id))
+    if suggested is None:
+        follow_graph = get_graph()
+        if follow_graph is None:
+            return []
+        suggested = follow_graph.suggest(user_id, limit)
+    return suggested[:limit]
+
+
+def suggested_authors(user, limit=SUGGESTIONS_LIMIT):
+    """Пользователи-рекомендации с числом общих подписок в ``common``."""
+    if not user.is_authenticated:
+        return []
+    suggested = suggestions(user.id, limit)
+    if not suggested:
+        return []
+    authors = User.objects.in_bulk([author_id for author_id, _ in suggested])
+    result = []
+    for author_id, common in suggested:
+        if author_id in authors:
+            authors[author_id].common = common
+            result.append(authors[author_id])
+    return result
+
+
+_worker_graph = None
+
+
+def init_worker(offsets, targets):
+    """Инициализатор пула: каждый процесс получает копию массивов графа."""
+    global _worker_graph
+    _worker_graph = FollowGraph(offsets, targets)
+
+
+def suggest_many(user_ids, limit=SUGGESTIONS_LIMIT):
+    return [(user_id, _worker_graph.suggest(user_id, limit))
+            for user_id in user_ids]
@@ -0,0 +1,142 @@
+"""Клиентская часть нагрузочного теста.
+
+Нагрузка открытая: запросы приходят пуассоновским потоком с заданной
+частотой и не ждут ответов на предыдущие, как настоящие посетители.
+Задержка считается от запланированного момента отправки, поэтому
+очередь в перегруженном сервере попадает в перцентили, а не прячется
+за медленным клиентом.
+
+Модуль не трогает базу: всё нужное — пути, cookie сессий, картинка —
+приходит в ``config``, так что процессы нагрузки просто форкаются.
+"""
+import http.client
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlencode
+
+from PIL import Image
+
+SCENARIOS = ('browse', 'feed', 'post', 'comment', 'upload')
+DEFAULT_MIX = 'browse=70,feed=15,post=4,comment=9,upload=2'
+
+_config = None
+
+
+def parse_mix(value):
+    """``'browse=70,feed=30'`` в {сценарий: вес}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Неизвестный сценарий: {name}')
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('Все веса сценариев нулевые.')
+    return mix
+
+
+def make_image():
+    """Небольшой JPEG для сценария загрузки."""
+    output = BytesIO()
+    Image.new('RGB', (640, 480), (90, 140, 200)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+def init_worker(config):
+    """Инициализатор пула процессов нагрузки."""
+    global _config
+    _config = dict(config)
+    _config['scenarios'] = list(config['mix'])
+    _config['weights'] = list(config['mix'].values())
+
+
+def _form(token, fields):
+    fields = dict(fields, csrfmiddlewaretoken=token)
+    return urlencode(fields).encode(), 'application/x-www-form-urlencoded'
+
+
+def _multipart(token, fields, image):
+    boundary = uuid.uuid4().hex
+    fields = dict(fields, csrfmiddlewaretoken=token)
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; '
+        f'name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="image"; '
+        f'filename="load.jpg"\r\nContent-Type: image/jpeg\r\n\r\n'.encode()
+        + image + f'\r\n--{boundary}--\r\n'.encode()
+    )
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def build(scenario, rng):
+    """Запрос сценария: (метод, путь, тело, заголовки).
+
+    Личность читателя — пара (заголовок Cookie, CSRF-токен формы).
+    """
+    config = _config
+    if scenario == 'browse':
+        return 'GET', rng.choice(config['browse_paths']), None, {}
+    cookie, token = rng.choice(config['identities'])
+    headers = {'Cookie': cookie}
+    if scenario == 'feed':
+        return 'GET', config['feed_path'], None, headers
+    text = f'Нагрузка {rng.getrandbits(32):08x}'
+    if scenario == 'comment':
+        path = rng.choice(config['comment_paths'])
+        body, content_type = _form(token, {'text': text})
+    elif scenario == 'post':
+        path = config['create_path']
+        body, content_type = _form(token, {'text': text})
+    else:
+        path = config['create_path']
+        body, content_type = _multipart(token, {'text': text},
+                                        config['image'])
+    headers['Content-Type'] = content_type
+    return 'POST', path, body, headers
+
+
+def send(scenario, request, scheduled):
+    """Отправляет запрос. Возвращает (сценарий, статус, секунды).
+
+    Статус 0 — ошибка соединения или таймаут.
+    """
+    method, path, body, headers = request
+    connection = http.client.HTTPConnection(
+        _config['host'], _config['port'], timeout=_config['timeout'])
+    try:
+        connection.request(method, path, body, headers)
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except (OSError, http.client.HTTPException):
+        status = 0
+    finally:
+        connection.close()
+    return scenario, status, time.perf_counter() - scheduled
+
+
+def run(process, rate, duration):
+    """Держит поток ``rate`` запросов в секунду ``duration`` секунд."""
+    rng = random.Random(_config['seed'] * 1_000_003 + process)
+    futures = []
+    with ThreadPoolExecutor(_config['concurrency']) as pool:
+        started = scheduled = time.perf_counter()
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled - started >= duration:
+                break
+            scenario = rng.choices(_config['scenarios'],
+                                   _config['weights'])[0]
+            request = build(scenario, rng)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(send, scenario, request, scheduled))
+    return [future.result() for future in futures]
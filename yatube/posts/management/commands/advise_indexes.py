@@ -0,0 +1,85 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.querylog import read_samples
+from core.reports import write_json
+from posts import advisor
+
+SHAPE_PREVIEW = 110
+
+
+class Command(BaseCommand):
+    help = ('Разбирает журнал запросов (QUERY_SAMPLE_RATE > 0), группирует '
+            'запросы по форме и предлагает составные индексы с миграциями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None,
+                            help='Журнал; по умолчанию QUERY_SAMPLE_LOG.')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Сколько самых затратных форм показать.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Прогонов запроса при замере.')
+        parser.add_argument('--write', action='store_true',
+                            help='Сохранить миграции в приложения.')
+        parser.add_argument('--json', dest='json_path',
+                            help='Куда записать отчёт; - для stdout.')
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.QUERY_SAMPLE_LOG
+        if not os.path.exists(path):
+            raise CommandError(f'Нет журнала {path}: включите '
+                               f'QUERY_SAMPLE_RATE и дайте сайту поработать.')
+        shapes, candidates = advisor.advise(read_samples(path),
+                                            options['repeat'])
+        writers = advisor.migrations_for(
+            [entry for entry in candidates if entry['fixed']])
+        if options['json_path']:
+            self.write_json(shapes[:options['top']], candidates, writers,
+                            options['json_path'])
+        else:
+            self.write_text(shapes[:options['top']], candidates, writers)
+        if options['write']:
+            for writer in writers:
+                with open(writer.path, 'w', encoding='utf-8') as output:
+                    output.write(writer.as_string())
+                self.stderr.write(f'Записана миграция {writer.path}')
+
+    def write_json(self, shapes, candidates, writers, json_path):
+        report = {
+            'shapes': [{
+                'shape': shape['shape'],
+                'calls': shape['calls'],
+                'total_ms': round(shape['total_ms'], 3),
+                'views': dict(shape['views']),
+                'plan': shape['plan'],
+                'problems': shape['problems'],
+            } for shape in shapes],
+            'candidates': [dict(entry, columns=list(entry['columns']))
+                           for entry in candidates],
+            'migrations': {writer.path: writer.as_string()
+                           for writer in writers},
+        }
+        write_json(self.stdout, report, json_path)
+
+    def write_text(self, shapes, candidates, writers):
+        self.stdout.write(f'{"вызовов":>8} {"всего, мс":>10}  форма')
+        for shape in shapes:
+            mark = ' [скан]' if shape['problems'] else ''
+            self.stdout.write(
+                f'{shape["calls"]:>8} {shape["total_ms"]:>10.1f}  '
+                f'{shape["shape"][:SHAPE_PREVIEW]}{mark}')
+        if not candidates:
+            self.stdout.write('Недостающих индексов не найдено.')
+            return
+        self.stdout.write('Кандидаты:')
+        for entry in candidates:
+            verdict = 'чинит план' if entry['fixed'] else 'план не чинит'
+            self.stdout.write(
+                f'  {entry["table"]} ({", ".join(entry["columns"])}): '
+                f'{verdict}, экономия ~{entry["saved_ms"]:.1f} мс '
+                f'({entry["saved_share"]:.0%} времени журнала), '
+                f'форм: {len(entry["shapes"])}')
+        for writer in writers:
+            self.stdout.write(f'\n# {writer.path}\n{writer.as_string()}')
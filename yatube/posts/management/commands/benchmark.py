@@ -0,0 +1,236 @@
+import platform
+import random
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from io import BytesIO, StringIO
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.template.base import Template
+from django.test import Client, override_settings
+from django.urls import reverse
+from faker import Faker
+from PIL import Image
+
+from core.reports import write_json
+from posts import feed, graph, threads, thumbnails
+from posts.models import Comment, Follow, Group, Post
+from posts.stats import recount_comments
+
+User = get_user_model()
+
+VIEWS = ('index', 'group_posts', 'profile', 'post_detail', 'follow_index')
+PERCENTILES = (50, 95, 99)
+# Адрес не из INTERNAL_IPS, чтобы debug toolbar не мерился вместе с view.
+CLIENT_ADDR = '10.0.0.1'
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(1, round(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@contextmanager
+def sql_timer():
+    """Считает запросы и их время точнее, чем журнал connection.queries."""
+    state = {'count': 0, 'seconds': 0.0}
+
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            state['count'] += 1
+            state['seconds'] += time.perf_counter() - started
+
+    with connection.execute_wrapper(wrapper):
+        yield state
+
+
+@contextmanager
+def template_timer():
+    """Считает время отрисовки шаблонов верхнего уровня.
+
+    Вложенные include и карточки входят во время внешнего шаблона
+    и отдельно не прибавляются.
+    """
+    original = Template.render
+    state = {'depth': 0, 'seconds': 0.0}
+
+    def render(self, context):
+        state['depth'] += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            state['depth'] -= 1
+            if not state['depth']:
+                state['seconds'] += time.perf_counter() - started
+
+    Template.render = render
+    try:
+        yield state
+    finally:
+        Template.render = original
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Засевает данные заданного размера в транзакции, которая потом '
+            'откатывается, и меряет страницы ленты через тестовый Client.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--comments', type=int, default=20,
+                            help='Комментариев у измеряемого поста.')
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок у измеряющего читателя.')
+        parser.add_argument('--images', type=int, default=0,
+                            help='Картинок с готовыми миниатюрами у '
+                                 'последних постов.')
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Не сбрасывать кэш между запросами.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path',
+                            help='Куда записать результат; - для stdout.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        # Картинки и миниатюры пишутся во временный MEDIA_ROOT.
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media):
+            try:
+                with transaction.atomic():
+                    urls, reader = self.seed()
+                    results = {name: self.measure(url, reader)
+                               for name, url in urls.items()}
+                    raise Rollback
+            except Rollback:
+                pass
+        cache.clear()
+        graph.reset()
+        report = {'meta': self.meta(), 'views': results}
+        self.write(report)
+
+    def seed(self):
+        options = self.options
+        fake = Faker('ru_RU')
+        Faker.seed(options['seed'])
+        rng = random.Random(options['seed'])
+        User.objects.bulk_create(
+            User(username=f'bench{number}', first_name=fake.first_name(),
+                 last_name=fake.last_name())
+            for number in range(options['users']))
+        users = list(User.objects.filter(username__startswith='bench')
+                     .order_by('id'))
+        Group.objects.bulk_create(
+            Group(title=fake.word(), slug=f'bench-{number}',
+                  description=fake.sentence())
+            for number in range(options['groups']))
+        groups = list(Group.objects.filter(slug__startswith='bench-'))
+        Post.objects.bulk_create(
+            (Post(author=rng.choice(users), group=rng.choice(groups),
+                  text=fake.paragraph(nb_sentences=5))
+             for _ in range(options['posts'])), batch_size=500)
+        reader, post = users[0], Post.objects.filter(
+            author__in=users).order_by('-id').first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=rng.choice(users), text=fake.sentence())
+            for _ in range(options['comments']))
+        authors = rng.sample(users[1:], min(options['follows'],
+                                            len(users) - 1))
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in authors)
+        self.attach_images(list(Post.objects.filter(author__in=users)
+                                .order_by('-id')[:options['images']]))
+        # Сигналы bulk_create не вызывает: собираем производные данные.
+        threads.fill_root_paths()
+        recount_comments([post.id])
+        call_command('recount_author_stats', stdout=StringIO())
+        feed.rebuild([reader.id])
+        graph.reset()
+        urls = {
+            'index': reverse('posts:index'),
+            'group_posts': reverse('posts:group_list',
+                                   kwargs={'slug': groups[0].slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': post.author.username}),
+            'post_detail': reverse('posts:post_detail',
+                                   kwargs={'post_id': post.id}),
+            'follow_index': reverse('posts:follow_index'),
+        }
+        return urls, reader
+
+    def attach_images(self, posts):
+        """Картинки у ``posts`` с миниатюрами, построенными заранее."""
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), 'teal').save(buffer, 'JPEG')
+        for post in posts:
+            post.image.save(f'bench{post.id}.jpg',
+                            ContentFile(buffer.getvalue()), save=False)
+            thumbnails.generate(post.image.name)
+        Post.objects.bulk_update(posts, ['image'])
+
+    def measure(self, url, reader):
+        client = Client(REMOTE_ADDR=CLIENT_ADDR)
+        client.force_login(reader)
+        client.get(url)
+        latencies, queries, sql, templates = [], [], [], []
+        for _ in range(self.options['requests']):
+            if not self.options['warm_cache']:
+                cache.clear()
+            with sql_timer() as executed, template_timer() as rendered:
+                started = time.perf_counter()
+                client.get(url)
+                latencies.append(time.perf_counter() - started)
+            queries.append(executed['count'])
+            sql.append(executed['seconds'])
+            templates.append(rendered['seconds'])
+        result = {f'p{q}_ms': round(percentile(latencies, q) * 1000, 3)
+                  for q in PERCENTILES}
+        count = len(latencies)
+        result.update({
+            'queries': round(sum(queries) / count, 2),
+            'sql_ms': round(sum(sql) / count * 1000, 3),
+            'template_ms': round(sum(templates) / count * 1000, 3),
+        })
+        return result
+
+    def meta(self):
+        options = self.options
+        return {
+            'sizes': {key: options[key] for key in (
+                'users', 'posts', 'groups', 'comments', 'follows',
+                'images')},
+            'requests': options['requests'],
+            'warm_cache': options['warm_cache'],
+            'seed': options['seed'],
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+        }
+
+    def write(self, report):
+        if write_json(self.stdout, report, self.options['json_path']):
+            return
+        header = ('view', *(f'p{q}, мс' for q in PERCENTILES),
+                  'запросов', 'SQL, мс', 'шаблоны, мс')
+        self.stdout.write(' '.join(f'{title:>12}' for title in header))
+        for name, result in report['views'].items():
+            row = (name, *result.values())
+            self.stdout.write(' '.join(f'{value:>12}' for value in row))
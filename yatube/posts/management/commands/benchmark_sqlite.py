@@ -0,0 +1,189 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+
+from core.reports import write_json
+from posts.management.commands.benchmark import PERCENTILES, percentile
+from posts.models import Comment, Post
+
+PAGE_SIZE = 10
+SAMPLE_POSTS = 1000
+
+
+def profile_settings(profile, path):
+    """Настройки базы-копии ``path`` для профиля сравнения."""
+    if profile == 'baseline':
+        # Как у голого django.db.backends.sqlite3: журнал отката и
+        # BEGIN DEFERRED. Режим журнала задаём явно: копия с базы в WAL
+        # унаследовала бы его.
+        return {'ENGINE': 'core.backends.sqlite3', 'NAME': path,
+                'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'}}
+    production = settings.DATABASE_PROFILES['production']
+    return {'ENGINE': production['ENGINE'], 'NAME': path,
+            'CONN_MAX_AGE': production.get('CONN_MAX_AGE', 0),
+            'OPTIONS': dict(production.get('OPTIONS', {}))}
+
+
+def read_page(alias, rng, post_ids):
+    """Страница ленты от случайного курсора и пост с комментариями."""
+    cursor = rng.choice(post_ids)
+    list(Post.objects.using(alias).select_related('author', 'group')
+         .filter(id__lt=cursor).order_by('-id')[:PAGE_SIZE])
+    post = Post.objects.using(alias).select_related('author').get(id=cursor)
+    list(Comment.objects.using(alias).filter(post=post)
+         .order_by('path')[:PAGE_SIZE])
+
+
+def write_comment(alias, rng, post_ids, author_ids):
+    """Транзакция как у add_comment: прочитать пост, вставить, пересчитать."""
+    with transaction.atomic(using=alias):
+        post = Post.objects.using(alias).only('id').get(
+            id=rng.choice(post_ids))
+        Comment.objects.using(alias).bulk_create([Comment(
+            post=post, author_id=rng.choice(author_ids), text='Нагрузка')])
+        Post.objects.using(alias).filter(id=post.id).update(
+            comments_count=F('comments_count') + 1)
+
+
+def repeat(operation, duration):
+    """Времена удачных вызовов за ``duration`` секунд и число блокировок."""
+    latencies, failed = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            operation()
+        except OperationalError:
+            failed += 1
+        else:
+            latencies.append(time.perf_counter() - started)
+    return latencies, failed
+
+
+def summarize(latencies, errors, duration):
+    return {
+        'ops': len(latencies),
+        'per_second': round(len(latencies) / duration, 1),
+        'errors': errors,
+        **{f'p{q}_ms': round(percentile(latencies, q) * 1000, 3)
+           if latencies else None for q in PERCENTILES},
+    }
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность читателей и писателей '
+            'SQLite на копиях текущей базы: без настройки и с профилем '
+            'production из DATABASE_PROFILES.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4,
+                            help='Потоков чтения.')
+        parser.add_argument('--writers', type=int, default=2,
+                            help='Потоков записи.')
+        parser.add_argument('--duration', type=float, default=5,
+                            help='Секунд на профиль.')
+        parser.add_argument('--profiles', default='baseline,production')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path',
+                            help='Куда записать результат; - для stdout.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        post_ids = list(Post.objects.order_by('-id').values_list(
+            'id', flat=True)[:SAMPLE_POSTS])
+        author_ids = list(Post.objects.filter(id__in=post_ids).values_list(
+            'author_id', flat=True).distinct())
+        if not post_ids:
+            raise CommandError('В базе нет постов: засейте её через '
+                               'seed_dataset.')
+        profiles = [name for name in options['profiles'].split(',') if name]
+        unknown = set(profiles) - {'baseline', 'production'}
+        if unknown:
+            raise CommandError(f'Неизвестные профили: {", ".join(unknown)}')
+        connection.ensure_connection()
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                # backup копирует и файловую, и in-memory базу тестов.
+                target = sqlite3.connect(path)
+                connection.connection.backup(target)
+                target.close()
+                results[profile] = self.measure(
+                    profile, profile_settings(profile, path),
+                    post_ids, author_ids)
+        report = {
+            'meta': {key: options[key] for key in (
+                'readers', 'writers', 'duration', 'seed')},
+            'profiles': results,
+        }
+        self.write(report)
+
+    def measure(self, profile, database, post_ids, author_ids):
+        options = self.options
+        alias = f'benchmark_{profile}'
+        connections.databases[alias] = database
+        workers = ([('read', number) for number in range(options['readers'])]
+                   + [('write', number)
+                      for number in range(options['writers'])])
+        samples = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(len(workers))
+
+        def work(kind, number):
+            rng = random.Random(f'{options["seed"]}-{kind}-{number}')
+            if kind == 'read':
+                operation = partial(read_page, alias, rng, post_ids)
+            else:
+                operation = partial(write_comment, alias, rng, post_ids,
+                                    author_ids)
+            try:
+                start.wait()
+                latencies, failed = repeat(operation, options['duration'])
+            finally:
+                connections[alias].close()
+            with lock:
+                samples[kind] += latencies
+                errors[kind] += failed
+
+        threads = [threading.Thread(target=work, args=worker)
+                   for worker in workers]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            del connections.databases[alias]
+        probe = sqlite3.connect(database['NAME'])
+        journal_mode, = probe.execute('PRAGMA journal_mode').fetchone()
+        probe.close()
+        result = {'journal_mode': journal_mode}
+        for kind, latencies in samples.items():
+            result[kind] = summarize(latencies, errors[kind],
+                                     options['duration'])
+        return result
+
+    def write(self, report):
+        if write_json(self.stdout, report, self.options['json_path']):
+            return
+        header = ('операции', 'в секунду', 'ошибок',
+                  *(f'p{q}, мс' for q in PERCENTILES))
+        self.stdout.write(f'{"профиль":>18} '
+                          + ' '.join(f'{title:>10}' for title in header))
+        for profile, result in report['profiles'].items():
+            for kind in ('read', 'write'):
+                row = ('-' if value is None else value
+                       for value in result[kind].values())
+                self.stdout.write(f'{profile + ":" + kind:>18} '
+                                  + ' '.join(f'{value:>10}' for value in row))
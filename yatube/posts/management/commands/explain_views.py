@@ -0,0 +1,125 @@
+import re
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from core.reports import write_json
+from posts import graph, plans
+from posts.management.commands.benchmark import CLIENT_ADDR, Rollback
+from posts.models import AuthorStats, Comment, Group, Post
+
+NEXT_PAGE_RE = re.compile(r'[?&]after=([\w-]+)')
+SQL_PREVIEW = 100
+
+
+class Command(BaseCommand):
+    help = ('Открывает страницы posts/views.py на текущей базе, собирает их '
+            'SELECT и проверяет EXPLAIN QUERY PLAN: полный проход по '
+            'таблице или сортировка во временном B-дереве — ошибка.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', dest='json_path',
+                            help='Куда записать отчёт; - для stdout.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Планы разбираются только для SQLite.')
+        self.tables = set(connection.introspection.table_names())
+        try:
+            with transaction.atomic():
+                report = self.check_views(self.targets())
+                raise Rollback
+        except Rollback:
+            pass
+        cache.clear()
+        self.write(report, options['json_path'], options['verbosity'])
+        bad = [query for queries in report.values() for query in queries
+               if query['problems']]
+        if bad:
+            raise CommandError(f'Запросов со сканом или сортировкой: '
+                               f'{len(bad)}')
+
+    def targets(self):
+        """Адреса страниц на самых нагруженных объектах базы."""
+        post = Post.objects.order_by('-comments_count', '-id').first()
+        reader = (AuthorStats.objects.filter(following__gt=0)
+                  .select_related('author').order_by('-following').first())
+        if post is None or reader is None:
+            raise CommandError('Нужна засеянная база: запустите '
+                               'seed_dataset.')
+        author = (AuthorStats.objects.select_related('author')
+                  .order_by('-posts').first().author)
+        group = post.group or Group.objects.order_by('id').first()
+        root = (Comment.objects.filter(post=post, depth=0)
+                .order_by('-id').first())
+        urls = {
+            'index': reverse('posts:index'),
+            'profile': reverse('posts:profile', args=[author.username]),
+            'post_detail': reverse('posts:post_detail', args=[post.id]),
+            'post_comments': reverse('posts:post_comments', args=[post.id]),
+            'follow_index': reverse('posts:follow_index'),
+            'post_search': reverse('posts:search') + '?q='
+            + post.text.split()[0].strip('.,!?'),
+        }
+        if group:
+            urls['group_posts'] = reverse('posts:group_list',
+                                          args=[group.slug])
+        if root:
+            urls['comment_thread'] = reverse('posts:comment_thread',
+                                             args=[post.id, root.id])
+        return reader.author, urls
+
+    def check_views(self, targets):
+        reader, urls = targets
+        client = Client(REMOTE_ADDR=CLIENT_ADDR)
+        client.force_login(reader)
+        # Граф подписок живёт в памяти процесса и перечитывается в
+        # фоне: это не запрос страницы.
+        graph.refresh()
+        report = {}
+        for name, url in urls.items():
+            content = self.capture(client, name, url, report)
+            found = NEXT_PAGE_RE.findall(content)
+            if found:
+                separator = '&' if '?' in url else '?'
+                self.capture(client, f'{name} (дальше)',
+                             f'{url}{separator}after={found[-1]}', report)
+        graph.reset()
+        return report
+
+    def capture(self, client, name, url, report):
+        cache.clear()
+        with plans.capture_selects() as queries:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        report[name] = []
+        for sql, params in queries:
+            plan = plans.explain(sql, params)
+            report[name].append({
+                'sql': sql,
+                'plan': plan,
+                'indexes': plans.indexes(plan),
+                'problems': plans.problems(plan, self.tables, sql),
+            })
+        return response.content.decode()
+
+    def write(self, report, json_path, verbosity):
+        if write_json(self.stdout, report, json_path):
+            return
+        for name, queries in report.items():
+            self.stdout.write(f'{name}: запросов {len(queries)}')
+            for query in queries:
+                mark = 'ПЛОХО' if query['problems'] else 'ok'
+                sql = ' '.join(query['sql'].split())[:SQL_PREVIEW]
+                self.stdout.write(f'  [{mark}] {sql}')
+                self.stdout.write('         индексы: '
+                                  + (', '.join(query['indexes']) or '—'))
+                for problem in query['problems']:
+                    self.stdout.write(f'         {problem}')
+                if verbosity > 1:
+                    for detail in query['plan']:
+                        self.stdout.write(f'         | {detail}')
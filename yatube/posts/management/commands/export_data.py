@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.export import EXPORTS, FORMATS, export_stream
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты или комментарии потоком в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=tuple(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', default='-',
+                            help='Файл или «-» для stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, kind, format, gzip, output, chunk_size,
+               **options):
+        stream = export_stream(kind, format, gzip, chunk_size)
+        if output == '-':
+            target = getattr(self.stdout, 'buffer', None) or sys.stdout.buffer
+            for chunk in stream:
+                target.write(chunk)
+            target.flush()
+            return
+        with open(output, 'wb') as target:
+            for chunk in stream:
+                target.write(chunk)
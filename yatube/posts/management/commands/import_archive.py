@@ -0,0 +1,255 @@
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import cache as feed_cache
+from posts import feed, search, stats, threads
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+KINDS = ('post', 'comment', 'follow')
+REQUIRED = {
+    'post': ('author', 'text'),
+    'comment': ('post', 'author', 'text'),
+    'follow': ('user', 'author'),
+}
+INTEGERS = {'post': ('id',), 'comment': ('post',), 'follow': ()}
+
+
+def check_record(number, kind, record):
+    """Проверяет запись до записи в базу; ошибка называет номер строки."""
+    missing = [name for name in REQUIRED[kind] if not record.get(name)]
+    if missing:
+        raise CommandError(f'Строка {number}: нет полей {", ".join(missing)}.')
+    for name in INTEGERS[kind]:
+        try:
+            int(record.get(name) or 0)
+        except (TypeError, ValueError):
+            raise CommandError(f'Строка {number}: {name} не число.')
+    created = record.get('created')
+    if created:
+        try:
+            valid = parse_datetime(created) is not None
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            raise CommandError(f'Строка {number}: непонятная дата created.')
+
+
+@contextmanager
+def keep_created(model):
+    """Даёт bulk_create записать дату из архива вместо auto_now_add.
+
+    Флаг поля общий для процесса, поэтому выключается только на время
+    одного bulk_create.
+    """
+    field = model._meta.get_field('created')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты, комментарии и подписки из NDJSON или CSV '
+            'пачками bulk_create, затем пересобирает производные данные.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            default='ndjson')
+        parser.add_argument('--type', choices=KINDS,
+                            help='Тип записей CSV-файла.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, path, format, type, batch_size, **options):
+        if format == 'csv' and type is None:
+            raise CommandError('Для CSV укажите --type.')
+        self.user_ids, self.group_ids = {}, {}
+        self.touched_users, self.touched_authors = set(), set()
+        self.commented_posts, self.commented_authors = set(), set()
+        self.batch_size = batch_size
+        self.stats = dict.fromkeys(KINDS, 0)
+        self.skipped = 0
+        started = time.monotonic()
+        buffers = {kind: [] for kind in KINDS}
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            for kind, record in self.read(stream, format, type):
+                buffers[kind].append(record)
+                if len(buffers[kind]) >= batch_size:
+                    self.flush(buffers, upto=kind)
+            self.flush(buffers, upto=KINDS[-1])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.rebuild_derived()
+        elapsed = time.monotonic() - started
+        total = sum(self.stats.values())
+        self.stdout.write(
+            'Импортировано: ' + ', '.join(
+                f'{kind}={count}' for kind, count in self.stats.items())
+            + f', пропущено: {self.skipped}, '
+            f'{total / elapsed if elapsed else total:.0f} строк/с'
+        )
+
+    def read(self, stream, format, kind):
+        if format == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                check_record(reader.line_num, kind, row)
+                yield kind, row
+            return
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise CommandError(f'Строка {number}: не JSON.')
+            if not isinstance(record, dict) or record.get('type') not in KINDS:
+                raise CommandError(f'Строка {number}: неизвестный type.')
+            check_record(number, record['type'], record)
+            yield record['type'], record
+
+    def flush(self, buffers, upto):
+        """Пишет накопленные пачки; посты раньше ссылающихся на них."""
+        for kind in KINDS[:KINDS.index(upto) + 1]:
+            if buffers[kind]:
+                with transaction.atomic():
+                    getattr(self, f'write_{kind}s')(buffers[kind])
+                buffers[kind] = []
+
+    def resolve_users(self, usernames):
+        """id пользователей по именам; недостающие создаются одной пачкой."""
+        unknown = set(usernames) - set(self.user_ids)
+        if unknown:
+            found = dict(User.objects.filter(username__in=unknown)
+                         .values_list('username', 'id'))
+            missing = unknown - set(found)
+            if missing:
+                User.objects.bulk_create(
+                    User(username=name, password='!') for name in missing)
+                found.update(User.objects.filter(username__in=missing)
+                             .values_list('username', 'id'))
+            self.user_ids.update(found)
+        return self.user_ids
+
+    def resolve_groups(self, slugs):
+        unknown = set(slugs) - set(self.group_ids) - {None, ''}
+        if unknown:
+            found = dict(Group.objects.filter(slug__in=unknown)
+                         .values_list('slug', 'id'))
+            missing = unknown - set(found)
+            if missing:
+                Group.objects.bulk_create(
+                    Group(slug=slug, title=slug, description='')
+                    for slug in missing)
+                found.update(Group.objects.filter(slug__in=missing)
+                             .values_list('slug', 'id'))
+            self.group_ids.update(found)
+        return self.group_ids
+
+    @staticmethod
+    def created(record):
+        value = record.get('created')
+        return (parse_datetime(value) if value else None) or timezone.now()
+
+    def write_posts(self, records):
+        users = self.resolve_users(r['author'] for r in records)
+        groups = self.resolve_groups(r.get('group') for r in records)
+        posts = [
+            Post(id=int(record.get('id') or 0) or None,
+                 author_id=users[record['author']],
+                 group_id=groups.get(record.get('group')),
+                 text=record['text'],
+                 image=record.get('image') or '',
+                 created=self.created(record))
+            for record in records
+        ]
+        before = (Post.objects.order_by('-id')
+                  .values_list('id', flat=True).first() or 0)
+        with keep_created(Post):
+            Post.objects.bulk_create(posts)
+        rows = {post.id: post.text for post in posts if post.id}
+        if len(rows) < len(posts):
+            # SQLite не возвращает id из bulk_create: новые посты пачки —
+            # те, что выше прежнего максимума.
+            rows.update(Post.objects.filter(id__gt=before)
+                        .values_list('id', 'text'))
+        if search.fts_available():
+            search.index_posts(rows.items())
+        self.touched_authors.update(post.author_id for post in posts)
+        self.stats['post'] += len(posts)
+
+    def write_comments(self, records):
+        users = self.resolve_users(r['author'] for r in records)
+        post_ids = {int(record['post']) for record in records}
+        existing = dict(Post.objects.filter(id__in=post_ids)
+                        .values_list('id', 'author_id'))
+        comments = [
+            Comment(post_id=int(record['post']),
+                    author_id=users[record['author']],
+                    text=record['text'],
+                    created=self.created(record))
+            for record in records if int(record['post']) in existing
+        ]
+        with keep_created(Comment):
+            Comment.objects.bulk_create(comments)
+        self.commented_posts.update(comment.post_id for comment in comments)
+        self.commented_authors.update(existing[comment.post_id]
+                                      for comment in comments)
+        self.skipped += len(records) - len(comments)
+        self.stats['comment'] += len(comments)
+
+    def write_follows(self, records):
+        users = self.resolve_users(
+            name for r in records for name in (r['user'], r['author']))
+        pairs = {(users[r['user']], users[r['author']]) for r in records}
+        pairs = {(user, author) for user, author in pairs if user != author}
+        existing = set(
+            Follow.objects.filter(user_id__in={user for user, _ in pairs})
+            .values_list('user_id', 'author_id')
+        )
+        new_pairs = pairs - existing
+        Follow.objects.bulk_create(
+            (Follow(user_id=user, author_id=author)
+             for user, author in new_pairs), ignore_conflicts=True)
+        self.touched_users.update(user for user, _ in new_pairs)
+        self.touched_authors.update(author for _, author in new_pairs)
+        self.skipped += len(records) - len(new_pairs)
+        self.stats['follow'] += len(new_pairs)
+
+    def rebuild_derived(self):
+        """Один раз пересобирает то, что обычно ведут сигналы.
+
+        Только для затронутых импортом авторов, постов и читателей:
+        поисковый индекс уже пополнен пачками в ``write_posts``.
+        """
+        authors = sorted(self.touched_users | self.touched_authors
+                         | self.commented_authors)
+        for start in range(0, len(authors), self.batch_size):
+            stats.repair(authors[start:start + self.batch_size])
+        feed.sync_modes(authors)
+        feed.push_back(authors)
+        if self.commented_posts:
+            threads.fill_root_paths()
+            post_ids = sorted(self.commented_posts)
+            for start in range(0, len(post_ids), self.batch_size):
+                stats.recount_comments(
+                    post_ids[start:start + self.batch_size])
+        readers = set(self.touched_users) | set(
+            Follow.objects.filter(author_id__in=self.touched_authors)
+            .values_list('user_id', flat=True))
+        feed.rebuild(readers)
+        feed_cache.bump(feed_cache.ALL_FEEDS)
@@ -0,0 +1,291 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model)
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler,
+                                          get_internal_wsgi_application)
+from django.db import connections
+from django.middleware.csrf import CSRF_ALLOWED_CHARS, CSRF_TOKEN_LENGTH
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from core.reports import write_json
+from posts import loadtest
+from posts.management.commands.benchmark import PERCENTILES, percentile
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# Верхние границы корзин гистограммы задержек, мс.
+HISTOGRAM_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SAMPLE_POSTS = 1000
+SAMPLE_PROFILES = 200
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(server):
+    """Цикл процесса сервера в собственной группе процессов.
+
+    Группу останавливают целиком, вместе с пулом миниатюр, иначе
+    его процессы остаются сиротами.
+    """
+    os.setpgid(0, 0)
+    server.serve_forever()
+
+
+def histogram(latencies):
+    """Число ответов по корзинам HISTOGRAM_MS; последняя — всё дольше."""
+    buckets = Counter()
+    for seconds in latencies:
+        ms = seconds * 1000
+        bucket = next((f'<={edge}' for edge in HISTOGRAM_MS if ms <= edge),
+                      f'>{HISTOGRAM_MS[-1]}')
+        buckets[bucket] += 1
+    labels = [f'<={edge}' for edge in HISTOGRAM_MS] + [f'>{HISTOGRAM_MS[-1]}']
+    return {label: buckets[label] for label in labels}
+
+
+def summarize(samples):
+    """Ответы, отказы 429, ошибки и перцентили задержки."""
+    latencies = [seconds for _, status, seconds in samples]
+    errors = sum(1 for _, status, _ in samples
+                 if not status or (status >= 400 and status != 429))
+    result = {
+        'requests': len(samples),
+        'errors': errors,
+        'rejected': sum(1 for _, status, _ in samples if status == 429),
+    }
+    if latencies:
+        result.update({f'p{q}_ms': round(percentile(latencies, q) * 1000, 1)
+                       for q in PERCENTILES})
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Поднимает yatube.wsgi.application на локальном многопоточном '
+            'сервере и гоняет открытую нагрузку из нескольких процессов, '
+            'ступенями частоты, до насыщения. Пишет в базу: запускайте '
+            'на копии с seed_dataset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rates', default='10,25,50,100',
+                            help='Ступени частоты, запросов в секунду.')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность ступени, секунд.')
+        parser.add_argument('--mix', default=loadtest.DEFAULT_MIX,
+                            help='Веса сценариев: '
+                                 + ', '.join(loadtest.SCENARIOS) + '.')
+        parser.add_argument('--clients', type=int, default=4,
+                            help='Процессов нагрузки.')
+        parser.add_argument('--concurrency', type=int, default=64,
+                            help='Запросов в полёте на процесс нагрузки.')
+        parser.add_argument('--server-processes', type=int, default=1,
+                            help='Процессов сервера на общем сокете; '
+                                 '0 — сервер в потоке этого процесса.')
+        parser.add_argument('--target',
+                            help='Уже запущенный сервер на той же базе, '
+                                 'например http://127.0.0.1:8000.')
+        parser.add_argument('--users', type=int, default=50,
+                            help='Сколько пользователей логинить.')
+        parser.add_argument('--timeout', type=float, default=10)
+        parser.add_argument('--slo-ms', type=float, default=1000,
+                            help='Порог p99 для насыщения.')
+        parser.add_argument('--max-error-rate', type=float, default=0.01)
+        parser.add_argument('--keep-rate-limits', action='store_true',
+                            help='Не снимать RATE_LIMITS на время теста.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path',
+                            help='Куда записать результат; - для stdout.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        try:
+            rates = [float(rate) for rate in options['rates'].split(',')]
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        config = self.workload(mix)
+        overrides = {'DEBUG': False}
+        if not options['keep_rate_limits']:
+            overrides['RATE_LIMITS'] = {}
+        # Отладочная панель и журнал запросов исказили бы замеры.
+        with override_settings(**overrides):
+            stop = self.start_server(config)
+            try:
+                steps = self.drive(config, rates)
+            finally:
+                stop()
+                self.logout(config)
+        report = {'mix': mix, 'steps': steps,
+                  'saturation_rps': self.saturation(steps)}
+        self.write(report)
+
+    def workload(self, mix):
+        """Пути и сессии для клиентов из данных, что уже лежат в базе."""
+        posts = list(Post.objects.order_by('-id')
+                     .values_list('id', flat=True)[:SAMPLE_POSTS])
+        users = list(User.objects.filter(follower__isnull=False).distinct()
+                     .order_by('id')[:self.options['users']])
+        if not users:
+            users = list(User.objects.order_by('id')
+                         [:self.options['users']])
+        if not posts or not users:
+            raise CommandError('В базе нет постов или пользователей: '
+                               'сначала запустите seed_dataset.')
+        authors = (User.objects.filter(posts_of_author__isnull=False)
+                   .distinct().values_list('username', flat=True)
+                   [:SAMPLE_PROFILES])
+        slugs = Group.objects.values_list('slug', flat=True)[:SAMPLE_PROFILES]
+        browse_paths = [reverse('posts:index')]
+        browse_paths += [reverse('posts:post_detail', args=[post_id])
+                         for post_id in posts]
+        browse_paths += [reverse('posts:profile', args=[username])
+                         for username in authors]
+        browse_paths += [reverse('posts:group_list', args=[slug])
+                         for slug in slugs]
+        return {
+            'seed': self.options['seed'],
+            'mix': mix,
+            'timeout': self.options['timeout'],
+            'concurrency': self.options['concurrency'],
+            'browse_paths': browse_paths,
+            'comment_paths': [reverse('posts:add_comment', args=[post_id])
+                              for post_id in posts],
+            'feed_path': reverse('posts:follow_index'),
+            'create_path': reverse('posts:post_create'),
+            'identities': [self.login(user) for user in users],
+            'image': loadtest.make_image() if 'upload' in mix else b'',
+        }
+
+    def login(self, user):
+        """Сессия без формы входа: (заголовок Cookie, CSRF-токен)."""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        token = get_random_string(CSRF_TOKEN_LENGTH, CSRF_ALLOWED_CHARS)
+        cookie = (f'{settings.SESSION_COOKIE_NAME}={session.session_key}; '
+                  f'{settings.CSRF_COOKIE_NAME}={token}')
+        return cookie, token
+
+    def logout(self, config):
+        engine = import_module(settings.SESSION_ENGINE)
+        prefix = f'{settings.SESSION_COOKIE_NAME}='
+        for cookie, _ in config['identities']:
+            engine.SessionStore(cookie.split(';')[0][len(prefix):]).delete()
+
+    def start_server(self, config):
+        """Запускает сервер и возвращает функцию его остановки."""
+        target = self.options['target']
+        if target:
+            parts = urlsplit(target)
+            config['host'], config['port'] = parts.hostname, parts.port or 80
+            return lambda: None
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+        # settings.WSGI_APPLICATION, то есть yatube.wsgi.application.
+        server.set_app(get_internal_wsgi_application())
+        config['host'], config['port'] = server.server_address[:2]
+        processes = self.options['server_processes']
+        if not processes:
+            thread = threading.Thread(target=server.serve_forever,
+                                      daemon=True)
+            thread.start()
+
+            def stop():
+                server.shutdown()
+                server.server_close()
+            return stop
+        # Пре-форк: процессы принимают соединения с одного сокета.
+        # Открытые соединения с базой наследовать нельзя. Процессы не
+        # демоны: демону нельзя завести свой пул миниатюр.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [context.Process(target=serve, args=(server,))
+                    for _ in range(processes)]
+        for child in children:
+            child.start()
+
+        def stop():
+            for child in children:
+                try:
+                    os.killpg(child.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    # Процесс ещё не успел завести свою группу.
+                    child.terminate()
+                child.join()
+            server.server_close()
+        return stop
+
+    def drive(self, config, rates):
+        clients = self.options['clients']
+        duration = self.options['duration']
+        steps = []
+        with ProcessPoolExecutor(
+                clients, mp_context=multiprocessing.get_context('fork'),
+                initializer=loadtest.init_worker,
+                initargs=(config,)) as executor:
+            for rate in rates:
+                started = time.perf_counter()
+                samples = [sample for batch in executor.map(
+                    loadtest.run, range(clients), [rate / clients] * clients,
+                    [duration] * clients) for sample in batch]
+                elapsed = time.perf_counter() - started
+                step = {'offered_rps': rate,
+                        'achieved_rps': round(len(samples) / elapsed, 2)}
+                step.update(summarize(samples))
+                step['histogram_ms'] = histogram(
+                    seconds for _, _, seconds in samples)
+                step['scenarios'] = {
+                    scenario: summarize([sample for sample in samples
+                                         if sample[0] == scenario])
+                    for scenario in config['mix']
+                }
+                steps.append(step)
+                self.stderr.write(
+                    f'{rate:g} rps: {step["achieved_rps"]} rps, '
+                    f'p99 {step.get("p99_ms")} мс, ошибок {step["errors"]}')
+        return steps
+
+    def saturation(self, steps):
+        """Первая ступень, где сервер не успевает, ошибается или медлит."""
+        for step in steps:
+            requests = step['requests'] or 1
+            if (step['achieved_rps'] < step['offered_rps'] * 0.9
+                    or step['errors'] / requests
+                    > self.options['max_error_rate']
+                    or step.get('p99_ms', 0) > self.options['slo_ms']):
+                return step['offered_rps']
+        return None
+
+    def write(self, report):
+        if write_json(self.stdout, report, self.options['json_path']):
+            return
+        header = ('rps', 'получено', *(f'p{q}, мс' for q in PERCENTILES),
+                  'ошибок', '429')
+        self.stdout.write(' '.join(f'{title:>10}' for title in header))
+        for step in report['steps']:
+            row = (step['offered_rps'], step['achieved_rps'],
+                   *(step.get(f'p{q}_ms', '-') for q in PERCENTILES),
+                   step['errors'], step['rejected'])
+            self.stdout.write(' '.join(f'{value:>10}' for value in row))
+        saturation = report['saturation_rps']
+        self.stdout.write(
+            f'Насыщение на {saturation:g} rps' if saturation is not None
+            else 'Насыщение не достигнуто')
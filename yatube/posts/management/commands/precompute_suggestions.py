@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import graph
+
+
+class Command(BaseCommand):
+    help = 'Заранее считает рекомендации «кого почитать» для читателей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Процессов пула; по умолчанию по числу '
+                                 'ядер, 0 — без пула.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--limit', type=int,
+                            default=graph.SUGGESTIONS_LIMIT)
+
+    def handle(self, *args, workers, chunk_size, limit, **options):
+        if not settings.SHARED_CACHE:
+            # LocMemCache живёт в процессе команды: веб-процессы
+            # посчитанного не увидят.
+            raise CommandError('Рекомендации пишутся в кэш, нужен общий '
+                               'кэш: задайте CACHE_LOCATION.')
+        follow_graph = graph.FollowGraph.load()
+        offsets = follow_graph.offsets
+        readers = [user_id for user_id in range(len(offsets) - 1)
+                   if offsets[user_id + 1] > offsets[user_id]]
+        chunks = [readers[start:start + chunk_size]
+                  for start in range(0, len(readers), chunk_size)]
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers:
+            executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=graph.init_worker,
+                initargs=(offsets, follow_graph.targets))
+            results = executor.map(partial(graph.suggest_many, limit=limit),
+                                   chunks)
+        else:
+            executor = None
+            graph.init_worker(offsets, follow_graph.targets)
+            results = (graph.suggest_many(chunk, limit) for chunk in chunks)
+        done = 0
+        for chunk in results:
+            cache.set_many({graph.SUGGESTIONS_KEY.format(user_id): suggested
+                            for user_id, suggested in chunk},
+                           graph.SUGGESTIONS_TIMEOUT)
+            done += len(chunk)
+        if executor:
+            executor.shutdown()
+        self.stdout.write(f'Посчитано рекомендаций: {done}')
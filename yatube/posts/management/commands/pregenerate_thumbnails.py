@@ -0,0 +1,54 @@
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from posts import cache as feed_cache
+from posts.models import Post, Thumbnail
+from posts.thumbnails import generate, make_executor
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для картинок уже опубликованных постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Процессов пула; по умолчанию по числу '
+                                 'ядер, 0 — без пула.')
+        parser.add_argument('--chunk-size', type=int, default=100)
+        parser.add_argument('--missing', action='store_true',
+                            help='Только картинки без готовых миниатюр — '
+                                 'для запуска по крону с '
+                                 'THUMBNAIL_EXTERNAL.')
+
+    def handle(self, *args, workers, chunk_size, missing, **options):
+        images = Post.objects.exclude(image='').order_by()
+        if missing:
+            ready = (Thumbnail.objects.values('image')
+                     .annotate(sizes=Count('size'))
+                     .filter(sizes=len(settings.POST_THUMBNAIL_SIZES))
+                     .values('image'))
+            images = images.exclude(image__in=ready)
+        images = (images.values_list('image', flat=True).distinct()
+                  .iterator(chunk_size=chunk_size))
+        if workers is None:
+            workers = os.cpu_count() or 1
+        executor = make_executor(workers) if workers else None
+        done = failed = 0
+        # Отдаём пулу окно за окном, чтобы не держать все задачи в памяти.
+        window = chunk_size * max(workers, 1)
+        while True:
+            batch = list(islice(images, window))
+            if not batch:
+                break
+            results = (executor.map(generate, batch, chunksize=chunk_size)
+                       if executor else map(generate, batch))
+            for ok in results:
+                done += 1
+                failed += not ok
+        if executor:
+            executor.shutdown()
+        feed_cache.bump(feed_cache.ALL_FEEDS)
+        self.stdout.write(f'Обработано картинок: {done}, ошибок: {failed}')
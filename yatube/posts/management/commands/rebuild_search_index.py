@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Переиндексирует все посты для полнотекстового поиска.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        if not search.fts_available():
+            raise CommandError('Поиск FTS5 доступен только на SQLite.')
+        search.clear_index()
+        last_id, indexed = 0, 0
+        while True:
+            rows = list(Post.objects.filter(id__gt=last_id).order_by('id')
+                        .values_list('id', 'text')[:batch_size])
+            if not rows:
+                break
+            with transaction.atomic():
+                search.index_posts(rows)
+            last_id = rows[-1][0]
+            indexed += len(rows)
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import feed, stats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики авторов и исправляет расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, chunk_size, **options):
+        last_id, checked, repaired = 0, 0, 0
+        while True:
+            author_ids = list(User.objects.filter(id__gt=last_id)
+                              .order_by('id')
+                              .values_list('id', flat=True)[:chunk_size])
+            if not author_ids:
+                break
+            last_id = author_ids[-1]
+            checked += len(author_ids)
+            repaired += stats.repair(author_ids)
+        switched = feed.sync_modes() + feed.push_back()
+        self.stdout.write(f'Проверено авторов: {checked}, '
+                          f'исправлено: {repaired}, '
+                          f'сменили режим ленты: {switched}')
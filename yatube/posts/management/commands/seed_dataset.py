@@ -0,0 +1,194 @@
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from posts import cache as feed_cache
+from posts import feed, search, seeding
+from posts.management.commands.import_archive import keep_created
+from posts.models import Comment, Follow, Group, Post
+from posts.stats import recount_comments
+
+User = get_user_model()
+
+SEED_IMAGES = 8
+SEED_IMAGE_DIR = 'posts/seed'
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+class Command(BaseCommand):
+    help = ('Генерирует большой набор пользователей, групп, постов, '
+            'комментариев и подписок со степенными распределениями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--groups', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=2_000_000)
+        parser.add_argument('--follows-mean', type=float, default=50,
+                            help='Среднее число подписок читателя.')
+        parser.add_argument('--celebrities', type=int, default=20)
+        parser.add_argument('--image-share', type=float, default=0.1)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-feeds', action='store_true',
+                            help='Не раскладывать ленты подписок: на '
+                                 'миллионах подписок это самый долгий шаг.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.options = options
+        workers = options['workers']
+        if workers is None:
+            workers = os.cpu_count() or 1
+        now = timezone.now()
+        config = {
+            'seed': options['seed'],
+            'users': options['users'],
+            'groups': options['groups'],
+            'posts': options['posts'],
+            'celebrities': options['celebrities'],
+            'follows_mean': options['follows_mean'],
+            'image_share': options['image_share'],
+            'images': self.make_images() if options['image_share'] else [],
+            'start_ts': (now - timedelta(days=options['days'])).timestamp(),
+            'end_ts': now.timestamp(),
+            'first_user_id': next_id(User),
+            'first_group_id': next_id(Group),
+            'first_post_id': next_id(Post),
+            'first_comment_id': next_id(Comment),
+        }
+        self.created = {}
+        self.write_groups(config)
+        self.generate('users', config, options['users'], workers,
+                      self.write_users)
+        self.generate('follows', config, options['users'], workers,
+                      self.write_follows)
+        self.post_created = array('d')
+        self.generate('posts', config, options['posts'], workers,
+                      self.write_posts)
+        if options['posts']:
+            config['post_created'] = self.post_created
+            self.generate('comments', config, options['comments'],
+                          workers, self.write_comments)
+        self.rebuild_derived(config)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            'Создано: ' + ', '.join(f'{kind}={count}'
+                                    for kind, count in self.created.items())
+            + f' за {elapsed:.0f} с'
+        )
+
+    def generate(self, kind, config, total, workers, write):
+        """Раздаёт порции генератора процессам и пишет их по порядку."""
+        chunk_size = self.options['chunk_size']
+        chunks = [(kind, number, start, min(chunk_size, total - start))
+                  for number, start in enumerate(range(0, total, chunk_size))]
+        self.created[kind] = 0
+        if workers > 1 and len(chunks) > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=seeding.init_worker,
+                initargs=(config,))
+            results = executor.map(seeding.run, *zip(*chunks))
+        else:
+            executor = None
+            seeding.init_worker(config)
+            results = (seeding.run(*chunk) for chunk in chunks)
+        try:
+            for rows in results:
+                with transaction.atomic():
+                    write(rows)
+                self.created[kind] += len(rows)
+        finally:
+            if executor:
+                executor.shutdown()
+
+    def write_groups(self, config):
+        first_id = config['first_group_id']
+        Group.objects.bulk_create(
+            Group(id=first_id + number, title=f'Группа {first_id + number}',
+                  slug=f'seed-{first_id + number}', description='Сид')
+            for number in range(config['groups']))
+        self.created['groups'] = config['groups']
+
+    def write_users(self, rows):
+        now = timezone.now()
+        User.objects.bulk_create(
+            User(id=user_id, username=username, first_name=first_name,
+                 last_name=last_name, password='!', date_joined=now)
+            for user_id, username, first_name, last_name in rows)
+
+    def write_follows(self, rows):
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in rows), ignore_conflicts=True)
+
+    def write_posts(self, rows):
+        with keep_created(Post):
+            Post.objects.bulk_create(
+                Post(id=post_id, author_id=author_id, group_id=group_id,
+                     text=text, image=image, created=to_datetime(created))
+                for post_id, author_id, group_id, text, image, created
+                in rows)
+        self.post_created.extend(row[-1] for row in rows)
+
+    def write_comments(self, rows):
+        with keep_created(Comment):
+            Comment.objects.bulk_create(
+                Comment(id=comment_id, post_id=post_id, author_id=author_id,
+                        text=text, created=to_datetime(created),
+                        path=Comment.path_for('', comment_id))
+                for comment_id, post_id, author_id, text, created in rows)
+
+    def make_images(self):
+        """Несколько настоящих картинок, которые делят посты с image."""
+        directory = os.path.join(settings.MEDIA_ROOT, SEED_IMAGE_DIR)
+        os.makedirs(directory, exist_ok=True)
+        names = []
+        for number in range(SEED_IMAGES):
+            name = f'{SEED_IMAGE_DIR}/{number}.jpg'
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if not os.path.exists(path):
+                color = (number * 30 % 256, 120, 255 - number * 30 % 256)
+                Image.new('RGB', (1200, 800), color).save(path, 'JPEG')
+            names.append(name)
+        return names
+
+    def rebuild_derived(self, config):
+        """Сигналы bulk_create не вызывает: пересобираем производное."""
+        call_command('recount_author_stats', stdout=StringIO())
+        first_post_id = config['first_post_id']
+        recount_comments(Post.objects.filter(id__gte=first_post_id)
+                         .values('id'))
+        if self.created['posts'] and search.fts_available():
+            call_command('rebuild_search_index', stdout=StringIO())
+        if not self.options['skip_feeds']:
+            # Звёзды уже набрали подписчиков, их посты не раскладываются.
+            cache.delete(feed.PULL_AUTHORS_CACHE_KEY)
+            readers = range(config['first_user_id'],
+                            config['first_user_id'] + config['users'])
+            chunk_size = self.options['chunk_size']
+            for start in range(0, len(readers), chunk_size):
+                feed.rebuild(readers[start:start + chunk_size])
+        feed_cache.bump(feed_cache.ALL_FEEDS)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+
+class Command(BaseCommand):
+    help = ('Переключает режим ленты авторов: возвращает к раскладке '
+            'растерявших подписчиков. Запускается по расписанию.')
+
+    def handle(self, *args, **options):
+        pulled = feed.sync_modes()
+        pushed = feed.push_back()
+        self.stdout.write(f'Переведено в подмешивание: {pulled}, '
+                          f'возвращено к раскладке: {pushed}')
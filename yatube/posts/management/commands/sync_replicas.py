@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует базу default в файлы реплик SQLite из '
+            'REPLICA_DATABASES — так реплика догоняет основную базу.')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копировать умеем только SQLite; реплики '
+                               'других баз настраиваются репликацией.')
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('Реплики не настроены: задайте '
+                               'DATABASE_REPLICAS.')
+        primary.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            replica = connections[alias]
+            replica.close()
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: {replica.settings_dict["NAME"]}')
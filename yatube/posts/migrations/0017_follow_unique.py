@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:43
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000
+
+
+def recount(AuthorStats, Follow, field, key, author_ids):
+    counts = (Follow.objects.filter(**{key: OuterRef('author_id')})
+              .order_by().values(key).annotate(total=Count('id'))
+              .values('total'))
+    AuthorStats.objects.filter(author_id__in=author_ids).update(
+        **{field: Coalesce(Subquery(counts), 0)})
+
+
+def dedupe_follows(apps, schema_editor):
+    """Оставляет по одной подписке на пару, идя окнами по читателям."""
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    last_user_id = 0
+    while True:
+        user_ids = list(Follow.objects.filter(user_id__gt=last_user_id)
+                        .order_by('user_id').values_list('user_id', flat=True)
+                        .distinct()[:BATCH_SIZE])
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+        window = Follow.objects.filter(user_id__gte=user_ids[0],
+                                       user_id__lte=last_user_id)
+        keep = (window.order_by().values('user_id', 'author_id')
+                .annotate(keep=Min('id')).values('keep'))
+        duplicates = window.exclude(id__in=keep)
+        pairs = list(duplicates.values_list('user_id', 'author_id'))
+        if not pairs:
+            continue
+        duplicates.delete()
+        recount(AuthorStats, Follow, 'followers', 'author_id',
+                {author for _, author in pairs})
+        recount(AuthorStats, Follow, 'following', 'user_id',
+                {user for user, _ in pairs})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_comment_threads'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='follow_unique_user_author'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def mark_pulled_authors(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Post = apps.get_model('posts', 'Post')
+    pulled = AuthorStats.objects.filter(
+        followers__gte=settings.FEED_PULL_THRESHOLD)
+    for stats in pulled:
+        # Неизвестно, когда автор перешёл порог: считаем, что с первого
+        # поста, чтобы при возврате к раскладке ничего не потерялось.
+        first = Post.objects.filter(author_id=stats.author_id).aggregate(
+            first=Min('created'))['first']
+        stats.pulled_since = first or timezone.now()
+        stats.save(update_fields=['pulled_since'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_group_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='pulled_since',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Подмешивается с'),
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_authorstats_pulled_since'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Thumbnail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=255, verbose_name='Картинка')),
+                ('size', models.CharField(max_length=20, verbose_name='Размер')),
+                ('name', models.CharField(max_length=255, verbose_name='Файл миниатюры')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='thumbnail',
+            constraint=models.UniqueConstraint(fields=('image', 'size'), name='thumbnail_unique_image_size'),
+        ),
+    ]
@@ -5,6 +5,11 @@ from core.models import CreatedModel
 
 User = get_user_model()
 
+# Путь комментария — id предков и его собственный, по 10 цифр на уровень.
+# Поддерево тогда — диапазон строк [path, path + ':'), ':' идёт после '9'.
+COMMENT_PATH_STEP = 10
+COMMENT_MAX_DEPTH = 25
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -39,13 +44,34 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField('Комментариев', default=0,
+                                                 editable=False)
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        indexes = [
+            models.Index(fields=['created', 'id'],
+                         name='post_created_id_idx'),
+            models.Index(fields=['author', 'created', 'id'],
+                         name='post_author_created_idx'),
+            models.Index(fields=['group', 'created', 'id'],
+                         name='post_group_created_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Счётчик комментариев ведут сигналы через F(); сохранение
+        # отредактированного поста не должно затирать его старым значением.
+        if (not self._state.adding
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'comments_count'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(CreatedModel):
     text = models.TextField(
@@ -62,9 +88,53 @@ class Comment(CreatedModel):
         on_delete=models.CASCADE,
         related_name='comments'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True, null=True,
+        related_name='replies',
+        verbose_name='Ответ на'
+    )
+    path = models.CharField(
+        'Путь в ветке',
+        max_length=COMMENT_PATH_STEP * COMMENT_MAX_DEPTH,
+        default='',
+        editable=False
+    )
+    depth = models.PositiveSmallIntegerField('Уровень', default=0,
+                                             editable=False)
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['created', 'id'],
+                         name='comment_created_id_idx'),
+            models.Index(fields=['post', 'created', 'id'],
+                         name='comment_post_created_idx'),
+            models.Index(fields=['post', 'depth', 'created', 'id'],
+                         name='comment_post_depth_idx'),
+            models.Index(fields=['post', 'path'],
+                         name='comment_post_path_idx'),
+        ]
+
+    @staticmethod
+    def path_for(parent_path, pk):
+        return f'{parent_path}{pk:0{COMMENT_PATH_STEP}d}'
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding and self.parent_id:
+            parent = self.parent
+            if parent.depth + 1 >= COMMENT_MAX_DEPTH:
+                # Глубже не вкладываем: ответ встаёт рядом с родителем.
+                self.parent = parent = parent.parent
+            self.post_id = parent.post_id
+            self.depth = parent.depth + 1
+        super().save(*args, **kwargs)
+        if adding and not self.path:
+            parent_path = self.parent.path if self.parent_id else ''
+            self.path = self.path_for(parent_path, self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
 
 
 class Follow(models.Model):
@@ -80,3 +150,68 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='follow_unique_user_author'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Материализованная лента подписок: пост в ленте читателя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    created = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        ordering = ['-created', '-post']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', 'created', 'post'],
+                         name='feed_user_created_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора для профиля и страницы поста."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts = models.PositiveIntegerField('Постов', default=0)
+    followers = models.PositiveIntegerField('Подписчиков', default=0,
+                                            db_index=True)
+    following = models.PositiveIntegerField('Подписок', default=0)
+    comments_received = models.PositiveIntegerField('Комментариев',
+                                                    default=0)
+    # С какого момента посты автора подмешиваются при чтении, а не
+    # раскладываются по лентам; None — раскладываются.
+    pulled_since = models.DateTimeField('Подмешивается с', null=True,
+                                        blank=True, db_index=True)
+
+
+class Thumbnail(models.Model):
+    """Готовая миниатюра картинки поста; пока её нет — заглушка."""
+    image = models.CharField('Картинка', max_length=255)
+    size = models.CharField('Размер', max_length=20)
+    name = models.CharField('Файл миниатюры', max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['image', 'size'],
+                                    name='thumbnail_unique_image_size'),
+        ]
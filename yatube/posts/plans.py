@@ -0,0 +1,89 @@
+"""Планы запросов SQLite: какие индексы берёт запрос и где он сканирует.
+
+Плохими считаются два шага плана: полный проход по таблице
+(``SCAN posts_post`` без ``USING INDEX``) и сортировка во временном
+B-дереве (``USE TEMP B-TREE FOR ORDER BY``). Оба растут вместе с
+таблицей, даже если на маленькой базе запрос быстрый.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+
+SCAN_RE = re.compile(r'^SCAN (\S+)')
+INDEX_RE = re.compile(r'USING (?:COVERING )?INDEX (\S+)'
+                      r'|USING (INTEGER PRIMARY KEY)'
+                      r'|VIRTUAL TABLE INDEX')
+RANK_ORDER_RE = re.compile(r'\bORDER BY\s+(?:"?\w+"?\.)?"?rank"?\b',
+                           re.IGNORECASE)
+
+
+@contextmanager
+def capture_selects():
+    """Собирает (sql, params) всех SELECT, выполненных внутри блока."""
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+def explain(sql, params=()):
+    """Шаги плана SQLite — текстовые строки EXPLAIN QUERY PLAN."""
+    with connection.cursor() as cursor:
+        # sqlite3 кэширует подготовленные запросы по тексту, а EXPLAIN
+        # не сверяет версию схемы и после CREATE или DROP INDEX отдал бы
+        # старый план. Версия схемы в тексте делает запрос новым.
+        cursor.execute('PRAGMA schema_version')
+        version, = cursor.fetchone()
+        cursor.execute(f'EXPLAIN QUERY PLAN /* schema {version} */ {sql}',
+                       params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def indexes(plan):
+    """Индексы, которые использует план, по порядку шагов."""
+    used = []
+    for detail in plan:
+        for match in INDEX_RE.finditer(detail):
+            name = match.group(1) or match.group(2) or 'VIRTUAL TABLE'
+            if name not in used:
+                used.append(name)
+    return used
+
+
+def ranks_full_text(plan, sql):
+    """Запрос читает только таблицу FTS и сортирует по её ``rank``."""
+    steps = [detail for detail in plan if 'USE TEMP B-TREE' not in detail]
+    return (bool(steps) and bool(RANK_ORDER_RE.search(sql))
+            and all('VIRTUAL TABLE' in detail for detail in steps))
+
+
+def problems(plan, tables=None, sql=''):
+    """Шаги плана с полным проходом по таблице или временной сортировкой.
+
+    Проход по подзапросу или CTE, уже посчитанному в памяти, проблемой
+    не считается: проверяются только имена из ``tables``.
+    """
+    if tables is None:
+        tables = set(connection.introspection.table_names())
+    # Релевантность bm25 считается по найденным строкам, индекса по ней
+    # не бывает. Терпим только эту сортировку — ORDER BY rank в запросе
+    # к одной таблице FTS; без текста запроса исключений нет.
+    allowed_sorts = 1 if ranks_full_text(plan, sql) else 0
+    found = []
+    for detail in plan:
+        match = SCAN_RE.match(detail)
+        sorts = 'USE TEMP B-TREE' in detail
+        if sorts and 'ORDER BY' in detail and allowed_sorts:
+            allowed_sorts -= 1
+            continue
+        scans = (match and match.group(1) in tables
+                 and not INDEX_RE.search(detail))
+        if sorts or scans:
+            found.append(detail)
+    return found
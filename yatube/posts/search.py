@@ -0,0 +1,107 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5."""
+import re
+
+from django.db import connection
+
+from .models import Post
+from .utils import CursorPaginator, InSubquery, pack_token, unpack_token
+
+FTS_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос пользователя как безопасное выражение MATCH.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 в тексте
+    запроса не срабатывают; слова объединяются через AND.
+    """
+    return ' '.join(f'"{word}"' for word in WORD_RE.findall(query))
+
+
+def index_post(post_id, text):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                       f'VALUES (%s, %s)', [post_id, text])
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                       [post_id])
+
+
+def index_posts(rows):
+    """Добавляет в индекс пары (id, text) одним executemany."""
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                           f'VALUES (%s, %s)', list(rows))
+
+
+def clear_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+
+def filter_posts(queryset, query):
+    """Сужает queryset до постов, подходящих под запрос (для админки)."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset
+    if not fts_available():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(id__in=InSubquery(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [expression]
+    ))
+
+
+class SearchPaginator(CursorPaginator):
+    """Результаты поиска по BM25 с курсором по ключу (rank, id)."""
+
+    def __init__(self, query, per_page, after=None, before=None):
+        super().__init__(Post.objects.none(), per_page, after, before)
+        self.expression = match_expression(query)
+
+    def parse_cursor(self, token):
+        try:
+            rank, pk = unpack_token(token)
+            return float(rank), int(pk)
+        except (TypeError, ValueError):
+            return None
+
+    def cursor_for(self, post):
+        return pack_token(repr(post.search_rank), post.id)
+
+    def _fetch(self, cursor, backwards):
+        if not self.expression:
+            return []
+        # bm25 в FTS5 отрицателен: чем меньше rank, тем лучше совпадение.
+        lookup, order = ('<', 'DESC') if backwards else ('>', 'ASC')
+        sql = (f'SELECT rowid, rank FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s')
+        params = [self.expression]
+        if cursor is not None:
+            sql += (f' AND (rank {lookup} %s'
+                    f' OR (rank = %s AND rowid {lookup} %s))')
+            rank, pk = cursor
+            params += [rank, rank, pk]
+        sql += f' ORDER BY rank {order}, rowid {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            ranks = db_cursor.fetchall()
+        posts = (Post.objects.select_related('author', 'group')
+                 .in_bulk([pk for pk, _ in ranks]))
+        rows = []
+        for pk, rank in ranks:
+            if pk in posts:
+                posts[pk].search_rank = rank
+                rows.append(posts[pk])
+        return rows
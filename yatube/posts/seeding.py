@@ -0,0 +1,158 @@
+"""Генерация синтетических данных в форме продакшена.
+
+* Подписчики распределены по степенному закону (Zipf): немногие
+  «звёзды» собирают основную часть подписок, у остальных длинный хвост.
+* Активность авторов тоже степенная, звёзды пишут чаще.
+* Посты идут всплесками вокруг случайных моментов, а не равномерно.
+* Комментарии тянутся к популярным постам и приходят вскоре после них.
+
+Генерация не трогает базу и зависит только от зерна и номера порции,
+поэтому порции раздаются процессам, а пишет в базу один процесс:
+у SQLite всё равно один писатель.
+"""
+import itertools
+import random
+from bisect import bisect_left
+
+from faker import Faker
+
+ZIPF_EXPONENT = 1.1
+ACTIVITY_EXPONENT = 0.8
+POPULARITY_EXPONENT = 1.2
+CELEBRITY_BOOST = 20
+FOLLOWS_PARETO_ALPHA = 2
+GROUP_SHARE = 0.7
+BURST_MEAN_SIZE = 40
+BURST_MEAN_SECONDS = 60 * 60
+COMMENT_MEAN_DELAY = 60 * 60 * 2
+# Большое простое: перемешивает ранги популярности по id постов.
+SCRAMBLE_PRIME = 2_147_483_647
+
+_config = None
+
+
+def cumulative_weights(count, exponent, boosted=0):
+    """Накопленные веса Zipf; первые ``boosted`` рангов усилены."""
+    return list(itertools.accumulate(
+        (CELEBRITY_BOOST if rank <= boosted else 1) / rank ** exponent
+        for rank in range(1, count + 1)
+    ))
+
+
+def pick(rng, cum_weights):
+    """Ранг (от нуля) по накопленным весам."""
+    point = rng.random() * cum_weights[-1]
+    return bisect_left(cum_weights, point)
+
+
+def init_worker(config):
+    """Инициализатор пула: веса считаются в процессе, а не передаются."""
+    global _config
+    _config = dict(config)
+    _config['followed'] = cumulative_weights(
+        config['users'], ZIPF_EXPONENT, config['celebrities'])
+    _config['active'] = cumulative_weights(
+        config['users'], ACTIVITY_EXPONENT, config['celebrities'])
+    if config.get('post_created'):
+        _config['popular'] = cumulative_weights(config['posts'],
+                                                POPULARITY_EXPONENT)
+
+
+def _generators(chunk):
+    seed = _config['seed'] * 1_000_003 + chunk
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    return random.Random(seed), fake
+
+
+def users(chunk, start, count):
+    """Строки (id, username, first_name, last_name)."""
+    rng, fake = _generators(chunk)
+    first_id = _config['first_user_id']
+    rows = []
+    for number in range(start, start + count):
+        prefix = 'star' if number < _config['celebrities'] else 'seed'
+        rows.append((first_id + number, f'{prefix}{first_id + number}',
+                     fake.first_name(), fake.last_name()))
+    return rows
+
+
+def follows(chunk, start, count):
+    """Пары (user_id, author_id) для читателей порции, без повторов."""
+    rng, _ = _generators(chunk)
+    first_id, total = _config['first_user_id'], _config['users']
+    scale = _config['follows_mean'] * (FOLLOWS_PARETO_ALPHA - 1) / (
+        FOLLOWS_PARETO_ALPHA)
+    rows = []
+    for number in range(start, start + count):
+        wanted = min(total - 1,
+                     int(rng.paretovariate(FOLLOWS_PARETO_ALPHA) * scale))
+        authors = set()
+        for _ in range(wanted * 3):
+            if len(authors) >= wanted:
+                break
+            rank = pick(rng, _config['followed'])
+            if rank != number:
+                authors.add(rank)
+        rows.extend((first_id + number, first_id + rank)
+                    for rank in sorted(authors))
+    return rows
+
+
+def posts(chunk, start, count):
+    """Строки (id, author_id, group_id, text, image, created_ts)."""
+    rng, fake = _generators(chunk)
+    config = _config
+    span = config['end_ts'] - config['start_ts']
+    rows, left, center = [], 0, 0.0
+    for number in range(start, start + count):
+        if not left:
+            # Новый всплеск: момент и сколько постов вокруг него.
+            center = config['start_ts'] + rng.random() * span
+            left = max(1, int(rng.expovariate(1 / BURST_MEAN_SIZE)))
+        left -= 1
+        created = min(config['end_ts'], center + rng.expovariate(
+            1 / BURST_MEAN_SECONDS))
+        group_id = None
+        if config['groups'] and rng.random() < GROUP_SHARE:
+            group_id = config['first_group_id'] + rng.randrange(
+                config['groups'])
+        image = ''
+        if config['images'] and rng.random() < config['image_share']:
+            image = rng.choice(config['images'])
+        author_id = config['first_user_id'] + pick(rng, config['active'])
+        rows.append((config['first_post_id'] + number, author_id, group_id,
+                     fake.paragraph(nb_sentences=rng.randint(1, 8)), image,
+                     created))
+    return rows
+
+
+def comments(chunk, start, count):
+    """Строки (id, post_id, author_id, text, created_ts)."""
+    rng, fake = _generators(chunk)
+    config = _config
+    rows = []
+    for number in range(start, start + count):
+        rank = pick(rng, config['popular'])
+        index = rank * SCRAMBLE_PRIME % config['posts']
+        created = min(config['end_ts'],
+                      config['post_created'][index]
+                      + rng.expovariate(1 / COMMENT_MEAN_DELAY))
+        rows.append((config['first_comment_id'] + number,
+                     config['first_post_id'] + index,
+                     config['first_user_id'] + rng.randrange(config['users']),
+                     fake.sentence(), created))
+    return rows
+
+
+def run(kind, chunk, start, count):
+    """Точка входа для пула: ``kind`` — имя генератора этого модуля."""
+    return GENERATORS[kind](chunk, start, count)
+
+
+GENERATORS = {
+    'users': users,
+    'follows': follows,
+    'posts': posts,
+    'comments': comments,
+}
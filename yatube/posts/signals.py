@@ -0,0 +1,106 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, feed, graph, search, stats
+from .models import Comment, Follow, Group, Post, User
+
+USER_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    instance._old_group_slug = None
+    if instance.pk and not raw:
+        instance._old_group_slug = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group__slug', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def on_post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    group_slug = instance.group.slug if instance.group_id else None
+    old_group_slug = getattr(instance, '_old_group_slug', None)
+    cache.bump(*cache.post_scopes(instance, group_slug, old_group_slug))
+    if search.fts_available():
+        search.index_post(instance.id, instance.text)
+    if created:
+        stats.bump(instance.author_id, posts=1)
+        feed.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def on_post_deleted(sender, instance, **kwargs):
+    group_slug = (Group.objects.filter(id=instance.group_id)
+                  .values_list('slug', flat=True).first())
+    cache.bump(*cache.post_scopes(instance, group_slug))
+    stats.bump(instance.author_id, posts=-1)
+    if search.fts_available():
+        search.unindex_post(instance.id)
+
+
+def bump_post_feeds(post_id):
+    """Сбрасывает ленты поста: в их API-списках есть ``comments_count``."""
+    post = (Post.objects.select_related('author', 'group')
+            .filter(id=post_id).first())
+    if post is not None:
+        group_slug = post.group.slug if post.group_id else None
+        cache.bump(*cache.post_scopes(post, group_slug))
+    return post
+
+
+@receiver(post_save, sender=Comment)
+def on_comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(id=instance.post_id).update(
+            comments_count=F('comments_count') + 1)
+        post = bump_post_feeds(instance.post_id)
+        stats.bump(post.author_id, comments_received=1)
+
+
+@receiver(post_delete, sender=Comment)
+def on_comment_deleted(sender, instance, **kwargs):
+    post = bump_post_feeds(instance.post_id)
+    if post is not None:
+        Post.objects.filter(id=instance.post_id, comments_count__gt=0).update(
+            comments_count=F('comments_count') - 1)
+        stats.bump(post.author_id, comments_received=-1)
+
+
+@receiver(post_save, sender=Follow)
+def on_follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        cache.bump(f'profile:{instance.author.username}')
+        stats.bump(instance.author_id, followers=1)
+        stats.bump(instance.user_id, following=1)
+        feed.sync_modes([instance.author_id])
+        feed.backfill(instance.user_id, instance.author_id)
+        graph.on_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def on_follow_deleted(sender, instance, **kwargs):
+    cache.bump(f'profile:{instance.author.username}')
+    stats.bump(instance.author_id, followers=-1)
+    stats.bump(instance.user_id, following=-1)
+    feed.trim(instance.user_id, instance.author_id)
+    graph.on_follow(instance.user_id, instance.author_id, following=False)
+
+
+@receiver(post_save, sender=User)
+def on_user_saved(sender, instance, created, update_fields=None,
+                  raw=False, **kwargs):
+    if created or raw:
+        return
+    if update_fields and not USER_DISPLAY_FIELDS & set(update_fields):
+        return
+    cache.bump(cache.ALL_FEEDS)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def on_group_changed(sender, **kwargs):
+    cache.bump(cache.ALL_FEEDS)
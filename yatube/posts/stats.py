@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post
+
+STATS_FIELDS = ('posts', 'followers', 'following', 'comments_received')
+
+
+def count_stats(author_ids):
+    """Считает счётчики авторов по исходным таблицам: {id: {поле: n}}."""
+    stats = {author_id: dict.fromkeys(STATS_FIELDS, 0)
+             for author_id in author_ids}
+    sources = (
+        ('posts', Post.objects, 'author'),
+        ('followers', Follow.objects, 'author'),
+        ('following', Follow.objects, 'user'),
+        ('comments_received', Comment.objects, 'post__author'),
+    )
+    for field, manager, key in sources:
+        rows = (manager.filter(**{f'{key}__in': author_ids})
+                .order_by().values(key).annotate(total=Count('pk'))
+                .values_list(key, 'total'))
+        for author_id, total in rows:
+            stats[author_id][field] = total
+    return stats
+
+
+def recount(author_id):
+    """Пересчитывает и сохраняет строку счётчиков одного автора."""
+    values = count_stats([author_id])[author_id]
+    stats, _ = AuthorStats.objects.update_or_create(author_id=author_id,
+                                                    defaults=values)
+    return stats
+
+
+@transaction.atomic
+def repair(author_ids):
+    """Сверяет счётчики авторов с подсчётом и чинит расхождения.
+
+    Возвращает число созданных и исправленных строк.
+    """
+    expected = count_stats(author_ids)
+    existing = AuthorStats.objects.select_for_update().in_bulk(author_ids)
+    missing, drifted = [], []
+    for author_id, values in expected.items():
+        stats = existing.get(author_id)
+        if stats is None:
+            missing.append(AuthorStats(author_id=author_id, **values))
+            continue
+        if any(getattr(stats, field) != values[field]
+               for field in STATS_FIELDS):
+            for field in STATS_FIELDS:
+                setattr(stats, field, values[field])
+            drifted.append(stats)
+    AuthorStats.objects.bulk_create(missing)
+    AuthorStats.objects.bulk_update(drifted, STATS_FIELDS)
+    return len(missing) + len(drifted)
+
+
+def get_stats(author_id):
+    try:
+        return AuthorStats.objects.get(author_id=author_id)
+    except AuthorStats.DoesNotExist:
+        return recount(author_id)
+
+
+def clamped(**deltas):
+    """Выражения сдвига счётчиков, не уходящие ниже нуля."""
+    return {field: Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items()}
+
+
+def bump(author_id, **deltas):
+    """Атомарно сдвигает счётчики автора, например ``bump(1, posts=1)``.
+
+    Счётчики не уходят ниже нуля, даже если успели разойтись с данными.
+    Если строки ещё нет, при росте она считается с нуля, а при
+    уменьшении не создаётся: автор может удаляться каскадом.
+    """
+    shift = clamped(**deltas)
+    with transaction.atomic():
+        stats = AuthorStats.objects.filter(author_id=author_id)
+        if stats.update(**shift) or min(deltas.values()) <= 0:
+            return
+        # Подсчёт уже учитывает изменение. Если строку успел создать
+        # соседний запрос, сдвигаем её как обычно.
+        _, created = AuthorStats.objects.get_or_create(
+            author_id=author_id, defaults=count_stats([author_id])[author_id])
+        if not created:
+            stats.update(**shift)
+
+
+def recount_comments(post_ids=None):
+    """Пересчитывает денормализованное число комментариев у постов."""
+    counts = (Comment.objects.filter(post_id=OuterRef('pk')).order_by()
+              .values('post_id').annotate(total=Count('pk'))
+              .values('total'))
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(id__in=post_ids)
+    return posts.update(comments_count=Coalesce(Subquery(counts), 0))
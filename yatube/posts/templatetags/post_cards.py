@@ -0,0 +1,57 @@
+from hashlib import md5
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from posts.thumbnails import prefetch_thumbnails
+from .post_images import Placeholder
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/post_sample.html'
+CARD_KEY = 'post_card:{}:{}'
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_version(post):
+    """Версия карточки: хэш полей поста, автора и группы.
+
+    Любая правка этих полей даёт новый ключ, и старая карточка
+    просто перестаёт запрашиваться.
+    """
+    author, group = post.author, post.group
+    fields = (
+        post.text, post.image.name, post.created.isoformat(),
+        author.username, author.first_name, author.last_name,
+        post.group_id, group and group.slug, group and group.title,
+    )
+    return md5(repr(fields).encode()).hexdigest()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Отдаёт пары (пост, html карточки), читая кэш одним get_many."""
+    posts = list(posts)
+    keys = [CARD_KEY.format(post.id, card_version(post)) for post in posts]
+    cached = cache.get_many(keys)
+    misses = [post for post, key in zip(posts, keys) if key not in cached]
+    thumbnails = prefetch_thumbnails(post.image for post in misses)
+    card_template = get_template(CARD_TEMPLATE)
+    rendered, cards = {}, []
+    for post, key in zip(posts, keys):
+        html = cached.get(key)
+        if html is None:
+            thumbnail = thumbnails.get(post.image.name)
+            if post.image and thumbnail is None:
+                thumbnail = Placeholder()
+            html = card_template.render({'post': post,
+                                         'thumbnail': thumbnail})
+            # Карточку с заглушкой не кэшируем: миниатюра скоро появится.
+            if not getattr(thumbnail, 'is_placeholder', False):
+                rendered[key] = html
+        cards.append((post, mark_safe(html)))
+    if rendered:
+        cache.set_many(rendered, CARD_TIMEOUT)
+    return cards
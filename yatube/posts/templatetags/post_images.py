@@ -0,0 +1,25 @@
+from django import template
+from django.templatetags.static import static
+
+from posts.thumbnails import ready_thumbnail
+
+register = template.Library()
+
+PLACEHOLDER = 'img/thumbnail-placeholder.svg'
+
+
+class Placeholder:
+    """Заглушка вместо миниатюры, которая ещё готовится."""
+    is_placeholder = True
+
+    @property
+    def url(self):
+        return static(PLACEHOLDER)
+
+
+@register.simple_tag
+def post_thumbnail(image, size='card'):
+    """Миниатюра картинки поста, не строящая её в рамках запроса."""
+    if not image:
+        return None
+    return ready_thumbnail(image, size) or Placeholder()
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.querylog import normalize, read_samples
+from posts import advisor
+from posts.models import Group, Post
+
+User = get_user_model()
+
+GROUP_PAGE_SQL = (
+    'SELECT "posts_post"."id" FROM "posts_post" '
+    'WHERE ("posts_post"."group_id" = %s AND ("posts_post"."created" < %s '
+    'OR ("posts_post"."created" = %s AND "posts_post"."id" < %s))) '
+    'ORDER BY "posts_post"."created" DESC, "posts_post"."id" DESC LIMIT 11'
+)
+
+
+class AdvisorTest(TestCase):
+    def setUp(self):
+        self.log = tempfile.NamedTemporaryFile(suffix='.jsonl',
+                                               delete=False).name
+        os.remove(self.log)
+        self.addCleanup(lambda: os.path.exists(self.log)
+                        and os.remove(self.log))
+        author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        Post.objects.bulk_create(
+            Post(author=author, group=self.group, text=f'Пост {number}')
+            for number in range(30))
+        cache.clear()
+
+    def browse_group(self, times=3):
+        with override_settings(QUERY_SAMPLE_RATE=1,
+                               QUERY_SAMPLE_LOG=self.log):
+            for _ in range(times):
+                cache.clear()
+                self.client.get(reverse('posts:group_list',
+                                        args=[self.group.slug]))
+
+    def test_sampling_logs_queries_with_view_and_timing(self):
+        self.browse_group(times=1)
+        samples = list(read_samples(self.log))
+        self.assertTrue(samples)
+        self.assertEqual({sample['view'] for sample in samples},
+                         {'posts:group_list'})
+        self.assertTrue(all(sample['ms'] >= 0 for sample in samples))
+        self.assertIn(self.group.slug, [param for sample in samples
+                                        for param in sample['params'] or ()])
+
+    def test_sampling_keeps_private_parameters_out(self):
+        self.client.force_login(User.objects.get(username='author'))
+        self.browse_group(times=1)
+        samples = list(read_samples(self.log))
+        self.assertTrue(all(sample['sql'].startswith('SELECT')
+                            for sample in samples))
+        private = [sample for sample in samples
+                   if '"django_session"' in sample['sql']
+                   or '"auth_user"."id" = %s' in sample['sql']]
+        self.assertEqual(len(private), 2)
+        self.assertTrue(all(sample['params'] is None for sample in private))
+        with open(self.log, encoding='utf-8') as log:
+            self.assertNotIn(self.client.session.session_key, log.read())
+
+    def test_sampling_is_off_by_default(self):
+        with override_settings(QUERY_SAMPLE_LOG=self.log):
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_normalize_folds_parameters(self):
+        self.assertEqual(
+            normalize('SELECT (1) AS "a"\n FROM "t" WHERE "t"."id" '
+                      'IN (%s, %s, %s) LIMIT 21'),
+            'SELECT (N) AS "a" FROM "t" WHERE "t"."id" IN (...) LIMIT N')
+
+    def test_candidate_puts_equality_before_ordering(self):
+        self.assertEqual(advisor.candidate(GROUP_PAGE_SQL, 'posts_post'),
+                         ('group_id', 'created', 'id'))
+
+    def test_suggests_missing_group_index_with_migration(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX post_group_created_idx')
+        self.browse_group()
+        out = StringIO()
+        call_command('advise_indexes', log=self.log, repeat=1,
+                     json_path='-', stdout=out)
+        report = json.loads(out.getvalue())
+        candidate, = report['candidates']
+        self.assertEqual((candidate['table'], candidate['columns']),
+                         ('posts_post', ['group_id', 'created', 'id']))
+        self.assertTrue(candidate['fixed'])
+        migration, = report['migrations'].values()
+        self.assertIn("fields=['group', 'created', 'id']", migration)
+        self.assertIn('migrations.AddIndex', migration)
+
+    def test_existing_indexes_are_not_suggested(self):
+        self.browse_group()
+        out = StringIO()
+        call_command('advise_indexes', log=self.log, repeat=1,
+                     json_path='-', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['candidates'], [])
@@ -0,0 +1,34 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.management.commands.benchmark import VIEWS, percentile
+from posts.models import Post
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_reports_every_view_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchmark', users=5, posts=30, groups=2, comments=3,
+                     follows=2, images=3, requests=3, json_path='-',
+                     stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(tuple(report['views']), VIEWS)
+        for name, result in report['views'].items():
+            with self.subTest(view=name):
+                self.assertEqual(set(result), {
+                    'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'sql_ms',
+                    'template_ms'})
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(report['meta']['sizes']['posts'], 30)
+        self.assertEqual(report['meta']['sizes']['images'], 3)
+        self.assertFalse(Post.objects.exists())
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.stats import recount_comments
+from posts.utils import QUANTTIY_OF_POSTS
+
+User = get_user_model()
+
+
+class CommentsPagingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{number}'),
+                text=f'Комментарий {number}')
+            for number in range(QUANTTIY_OF_POSTS + 5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_first_chunk_is_rendered_with_post(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), QUANTTIY_OF_POSTS)
+        self.assertEqual(comments[0], self.comments[-1])
+        self.assertIsNotNone(comments.paginator.next_cursor)
+        self.assertContains(response, 'Показать ещё')
+
+    def test_load_more_returns_next_chunk(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        cursor = response.context['comments'].paginator.next_cursor
+        more = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': cursor})
+        self.assertTemplateUsed(more, 'posts/includes/comments.html')
+        self.assertEqual(list(more.context['comments']),
+                         self.comments[4::-1])
+        self.assertNotContains(more, 'Показать ещё')
+
+    def test_chunk_query_count_does_not_depend_on_authors(self):
+        # Пост, корни веток и начала ответов, авторы приходят через JOIN.
+        with self.assertNumQueries(3):
+            self.client.get(reverse('posts:post_comments',
+                                    kwargs={'post_id': self.post.id}))
+
+    def test_comments_count_is_denormalized(self):
+        post = Post.objects.get(id=self.post.id)
+        self.assertEqual(post.comments_count, len(self.comments))
+        Comment.objects.get(id=self.comments[0].id).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, len(self.comments) - 1)
+
+    def test_edit_keeps_comments_count(self):
+        post = Post.objects.get(id=self.post.id)
+        Comment.objects.create(post=post, author=self.author, text='Новый')
+        # В памяти у поста старый счётчик, сохранение не должно его вернуть.
+        post.text = 'Исправленный пост'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Исправленный пост')
+        self.assertEqual(post.comments_count, len(self.comments) + 1)
+
+    def test_empty_update_fields_saves_nothing(self):
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Не сохранится'
+        with self.assertNumQueries(0):
+            post.save(update_fields=[])
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Пост')
+
+    def test_recount_comments(self):
+        Post.objects.update(comments_count=0)
+        recount_comments()
+        self.assertEqual(Post.objects.get(id=self.post.id).comments_count,
+                         len(self.comments))
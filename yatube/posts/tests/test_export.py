@@ -0,0 +1,59 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.export import export_rows
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_user(username='admin',
+                                             is_staff=True)
+        cls.posts = [Post.objects.create(author=cls.user, text=f'Пост {n}')
+                     for n in range(5)]
+        Comment.objects.create(post=cls.posts[0], author=cls.user,
+                               text='Комментарий')
+
+    def test_rows_are_chunked_by_key(self):
+        with self.assertNumQueries(3):
+            rows = list(export_rows('posts', chunk_size=2))
+        self.assertEqual([row['id'] for row in rows],
+                         [post.id for post in self.posts])
+
+    def test_command_writes_gzip_ndjson(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson.gz')
+            call_command('export_data', 'posts', '--gzip', '--output', path,
+                         '--chunk-size', '2')
+            with gzip.open(path, 'rt', encoding='utf-8') as dump:
+                rows = [json.loads(line) for line in dump]
+        self.assertEqual([row['text'] for row in rows],
+                         [post.text for post in self.posts])
+        self.assertEqual(rows[0]['author__username'], 'auth')
+
+    def test_endpoint_is_staff_only(self):
+        url = reverse('posts:export_data', kwargs={'kind': 'comments'})
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(self.admin)
+        response = client.get(url + '?format=csv')
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(rows[0]['text'], 'Комментарий')
+        self.assertEqual(client.get(reverse(
+            'posts:export_data', kwargs={'kind': 'users'})).status_code, 404)
@@ -0,0 +1,140 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts import feed
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(author=cls.author,
+                                           text='Старый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self):
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+
+    def feed_ids(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_follow_backfills_existing_posts(self):
+        self.assertEqual(self.feed_ids(), [])
+        self.follow()
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+
+    def test_new_post_is_pushed_to_followers(self):
+        self.follow()
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=new_post).exists())
+        self.assertEqual(self.feed_ids(), [new_post.id, self.old_post.id])
+
+    def test_unfollow_trims_feed(self):
+        self.follow()
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_repeated_follow_keeps_one_row(self):
+        self.follow()
+        self.follow()
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        self.assertEqual(self.feed_ids(), [self.old_post.id])
+
+
+@override_settings(FEED_PULL_THRESHOLD=2)
+class HybridFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.author = User.objects.create_user(username='author')
+        cls.fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=cls.fan, author=cls.celebrity)
+        Follow.objects.create(user=cls.reader, author=cls.celebrity)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_celebrity_posts_are_pulled_and_merged(self):
+        posts = []
+        for number in range(12):
+            author = self.celebrity if number % 2 else self.author
+            posts.append(Post.objects.create(author=author,
+                                             text=f'Пост {number}'))
+        self.assertFalse(FeedEntry.objects.filter(
+            post__author=self.celebrity).exists())
+        self.assertEqual(metrics.snapshot()['feed_fan_out_skipped'], 6)
+        url = reverse('posts:follow_index')
+        first_page = self.reader_client.get(url).context['page_obj']
+        cursor = first_page.paginator.next_cursor
+        second_page = self.reader_client.get(
+            url + f'?after={cursor}').context['page_obj']
+        ids = [post.id for post in first_page] + [
+            post.id for post in second_page]
+        self.assertEqual(ids, [post.id for post in reversed(posts)])
+        self.assertEqual(metrics.snapshot()['feed_merge_sources_max'], 2)
+
+
+@override_settings(FEED_PULL_THRESHOLD=4, FEED_PUSH_RATIO=0.8)
+class FeedModeSwitchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.celebrity = User.objects.create_user(username='celebrity')
+        self.reader, self.early, self.other, self.late = (
+            User.objects.create_user(username=name)
+            for name in ('reader', 'early', 'other', 'late'))
+
+    def feed_post_ids(self, user):
+        return set(FeedEntry.objects.filter(user=user)
+                   .values_list('post_id', flat=True))
+
+    def test_posts_missed_while_pulled_are_pushed_back(self):
+        for user in (self.reader, self.early, self.other):
+            Follow.objects.create(user=user, author=self.celebrity)
+        old_post = Post.objects.create(author=self.celebrity, text='Старый')
+        Follow.objects.create(user=self.late, author=self.celebrity)
+        self.assertTrue(feed.is_pulled(self.celebrity.id))
+        self.assertEqual(self.feed_post_ids(self.late), set())
+        pulled_post = Post.objects.create(author=self.celebrity,
+                                          text='Подмешанный')
+        self.assertEqual(self.feed_post_ids(self.reader), {old_post.id})
+        # Ниже порога, но не ниже порога возврата: режим не меняется.
+        Follow.objects.get(user=self.early).delete()
+        call_command('sync_feed_modes', stdout=StringIO())
+        self.assertTrue(feed.is_pulled(self.celebrity.id))
+        # Запрос сам не раскладывает: это работа команды.
+        Follow.objects.get(user=self.other).delete()
+        self.assertTrue(feed.is_pulled(self.celebrity.id))
+        self.assertEqual(self.feed_post_ids(self.reader), {old_post.id})
+        call_command('sync_feed_modes', stdout=StringIO())
+        self.assertFalse(feed.is_pulled(self.celebrity.id))
+        expected = {old_post.id, pulled_post.id}
+        self.assertEqual(self.feed_post_ids(self.reader), expected)
+        self.assertEqual(self.feed_post_ids(self.late), expected)
+        new_post = Post.objects.create(author=self.celebrity, text='Новый')
+        self.assertIn(new_post.id, self.feed_post_ids(self.late))
@@ -0,0 +1,142 @@
+import json
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.views import FOLLOW_BATCH_CHUNK
+from posts import cache as feed_cache
+from posts import graph
+from posts.follows import follow_many, unfollow_many
+from posts.models import AuthorStats, FeedEntry, Follow, Post
+from posts.stats import get_stats
+
+User = get_user_model()
+
+
+class BulkFollowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'author{number}')
+                       for number in range(3)]
+        cls.posts = [Post.objects.create(author=author, text='Пост')
+                     for author in cls.authors]
+
+    def setUp(self):
+        cache.clear()
+        graph.reset()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_pair_is_unique(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.authors[0])
+
+    def test_follow_many(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        ids = [author.id for author in self.authors] + [self.reader.id]
+        new_ids = follow_many(self.reader, ids)
+        self.assertEqual(new_ids, {self.authors[1].id, self.authors[2].id})
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(get_stats(self.reader.id).following, 3)
+        self.assertEqual(get_stats(self.authors[1].id).followers, 1)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3)
+
+    def test_follow_many_backfills_in_one_query(self):
+        extra = Post.objects.create(author=self.authors[1], text='Новый')
+        with mock.patch('posts.feed.FEED_BACKFILL_SIZE', 1), \
+                CaptureQueriesContext(connection) as queries:
+            follow_many(self.reader, [author.id for author in self.authors])
+        selects = [query['sql'] for query in queries.captured_queries
+                   if '"posts_post"."created"' in query['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.reader)
+                .values_list('post_id', flat=True)),
+            {self.posts[0].id, extra.id, self.posts[2].id})
+
+    def test_unfollow_many_keeps_followers_non_negative(self):
+        follow_many(self.reader, [self.authors[0].id])
+        AuthorStats.objects.filter(author=self.authors[0]).update(followers=0)
+        unfollow_many(self.reader, [self.authors[0].id])
+        self.assertEqual(get_stats(self.authors[0].id).followers, 0)
+
+    def test_unfollow_many_is_one_delete(self):
+        follow_many(self.reader, [author.id for author in self.authors])
+        with CaptureQueriesContext(connection) as queries:
+            removed = unfollow_many(self.reader, [self.authors[0].id,
+                                                  self.authors[1].id])
+        deletes = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('DELETE FROM "posts_follow"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(removed, {self.authors[0].id, self.authors[1].id})
+        self.assertEqual(get_stats(self.reader.id).following, 1)
+        self.assertEqual(get_stats(self.authors[0].id).followers, 0)
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.reader)
+                 .values_list('post_id', flat=True)),
+            [self.posts[2].id])
+
+    def test_unfollow_many_updates_derived_state(self):
+        # Сигналы удаления не срабатывают: всё, что делает
+        # on_follow_deleted, должно случиться и здесь.
+        follow_many(self.reader, [author.id for author in self.authors])
+        graph.get_graph()
+        scope = f'profile:{self.authors[0].username}'
+        generation = feed_cache.generations(scope)
+        unfollow_many(self.reader, [self.authors[0].id])
+        self.assertNotEqual(feed_cache.generations(scope), generation)
+        self.assertNotIn(self.authors[0].id,
+                         graph.get_graph().following(self.reader.id))
+        self.assertEqual(get_stats(self.authors[0].id).followers, 0)
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.reader, post=self.posts[0]).exists())
+
+    def test_api_charges_per_chunk(self):
+        url = reverse('api:follow_batch')
+        names = [f'nobody{number}' for number in range(FOLLOW_BATCH_CHUNK)]
+        with override_settings(RATE_LIMITS={'profile_follow': '2/m'}):
+            for _ in range(2):
+                response = self.client.post(
+                    url, json.dumps({'follow': names}),
+                    content_type='application/json')
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+            response = self.client.post(
+                url, json.dumps({'follow': names + ['one more']}),
+                content_type='application/json')
+        self.assertEqual(response.status_code,
+                         HTTPStatus.TOO_MANY_REQUESTS)
+
+    def test_api(self):
+        url = reverse('api:follow_batch')
+        response = self.client.post(url, json.dumps({
+            'follow': ['author0', 'author1', 'nobody'],
+            'unfollow': [],
+        }), content_type='application/json')
+        self.assertEqual(response.json(), {
+            'followed': ['author0', 'author1'],
+            'unfollowed': [],
+            'unknown': ['nobody'],
+        })
+        response = self.client.post(url, json.dumps({
+            'unfollow': ['author1'],
+        }), content_type='application/json')
+        self.assertEqual(response.json()['unfollowed'], ['author1'])
+        self.assertEqual(
+            list(Follow.objects.values_list('author__username', flat=True)),
+            ['author0'])
+
+    def test_api_rejects_bad_payload(self):
+        response = self.client.post(reverse('api:follow_batch'),
+                                    json.dumps({'follow': [{'id': 1}]}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
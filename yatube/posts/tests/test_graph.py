@@ -0,0 +1,103 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import graph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader, cls.alice, cls.bob, cls.carol, cls.dave = [
+            User.objects.create_user(username=name)
+            for name in ('reader', 'alice', 'bob', 'carol', 'dave')
+        ]
+        follows = (
+            (cls.reader, cls.alice), (cls.reader, cls.bob),
+            (cls.alice, cls.carol), (cls.bob, cls.carol),
+            (cls.alice, cls.dave), (cls.alice, cls.reader),
+            (cls.bob, cls.alice),
+        )
+        for user, author in follows:
+            Follow.objects.create(user=user, author=author)
+
+    def setUp(self):
+        cache.clear()
+        graph.reset()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_csr_arrays(self):
+        follow_graph = graph.FollowGraph.load()
+        self.assertEqual(sorted(follow_graph.following(self.reader.id)),
+                         [self.alice.id, self.bob.id])
+        self.assertEqual(list(follow_graph.following(self.carol.id)), [])
+        self.assertEqual(len(follow_graph.targets), 7)
+
+    def test_friends_of_friends_with_counts(self):
+        # Себя и уже прочитанных авторов не советуем.
+        self.assertEqual(graph.get_graph().suggest(self.reader.id),
+                         [(self.carol.id, 2), (self.dave.id, 1)])
+
+    def test_updates_follow_changes(self):
+        graph.get_graph()
+        Follow.objects.create(user=self.reader, author=self.carol)
+        Follow.objects.filter(user=self.reader, author=self.bob).delete()
+        with self.assertNumQueries(0):
+            suggested = graph.get_graph().suggest(self.reader.id)
+        self.assertEqual(suggested, [(self.dave.id, 1)])
+
+    def test_stale_graph_is_reloaded_in_background(self):
+        old = graph.get_graph()
+        graph._loaded_at -= graph.GRAPH_TTL + 1
+        with mock.patch.object(graph.threading, 'Thread') as thread:
+            with self.assertNumQueries(0):
+                self.assertIs(graph.get_graph(), old)
+        thread.return_value.start.assert_called_once_with()
+        # Подписка во время загрузки попадает и в новый граф.
+        graph.on_follow(self.reader.id, self.carol.id)
+        thread.call_args[1]['target']()
+        fresh = graph.get_graph()
+        self.assertIsNot(fresh, old)
+        self.assertIn(self.carol.id, fresh.following(self.reader.id))
+
+    def test_pages_show_suggestions(self):
+        urls = (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': 'alice'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                suggested = response.context['suggested']
+                self.assertEqual(suggested, [self.carol, self.dave])
+                self.assertEqual(suggested[0].common, 2)
+                self.assertContains(response, 'Кого почитать')
+
+    def test_precompute_needs_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, 'CACHE_LOCATION'):
+            call_command('precompute_suggestions', workers=0,
+                         stdout=StringIO())
+
+    @override_settings(SHARED_CACHE=True)
+    def test_precompute_command(self):
+        for workers in (0, 2):
+            with self.subTest(workers=workers):
+                cache.clear()
+                out = StringIO()
+                call_command('precompute_suggestions', workers=workers,
+                             chunk_size=2, stdout=out)
+                self.assertIn('Посчитано рекомендаций: 3', out.getvalue())
+                self.assertEqual(
+                    cache.get(graph.SUGGESTIONS_KEY.format(self.reader.id)),
+                    [(self.carol.id, 2), (self.dave.id, 1)])
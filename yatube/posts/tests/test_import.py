@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from posts import search
+from posts.models import AuthorStats, Comment, FeedEntry, Follow, Post
+
+User = get_user_model()
+
+ARCHIVE = [
+    {'type': 'post', 'id': 500, 'author': 'leo', 'group': 'books',
+     'text': 'Архивный пост про войну', 'created': '2010-01-02T03:04:05Z'},
+    {'type': 'post', 'id': 501, 'author': 'leo', 'text': 'Второй пост'},
+    {'type': 'comment', 'post': 500, 'author': 'fedor', 'text': 'Браво'},
+    {'type': 'comment', 'post': 999, 'author': 'fedor', 'text': 'Мимо'},
+    {'type': 'follow', 'user': 'fedor', 'author': 'leo'},
+    {'type': 'follow', 'user': 'fedor', 'author': 'leo'},
+]
+
+
+class ImportArchiveTest(TestCase):
+    def run_import(self, lines, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.data', delete=False,
+                                         encoding='utf-8') as archive:
+            archive.write('\n'.join(lines))
+        self.addCleanup(os.remove, archive.name)
+        out = StringIO()
+        call_command('import_archive', archive.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_ndjson_import_builds_derived_data(self):
+        out = self.run_import([json.dumps(record) for record in ARCHIVE],
+                              '--batch-size', '2')
+        self.assertIn('post=2, comment=1, follow=1, пропущено: 2', out)
+        post = Post.objects.get(id=500)
+        self.assertEqual(post.created.year, 2010)
+        self.assertEqual(post.group.slug, 'books')
+        self.assertEqual(Comment.objects.get().post, post)
+        self.assertTrue(Follow.objects.filter(user__username='fedor',
+                                              author=post.author).exists())
+        self.assertEqual(AuthorStats.objects.get(author=post.author).posts,
+                         2)
+        self.assertEqual(FeedEntry.objects.filter(
+            user__username='fedor').count(), 2)
+        self.assertEqual(list(search.filter_posts(Post.objects.all(),
+                                                  'войну')), [post])
+        self.assertEqual(set(search.filter_posts(Post.objects.all(), 'пост')
+                             .values_list('id', flat=True)), {500, 501})
+
+    def test_rebuild_touches_only_imported_data(self):
+        other = User.objects.create_user(username='other')
+        post = Post.objects.create(author=other, text='Старый пост про мир')
+        AuthorStats.objects.filter(author=other).update(posts=5)
+        Post.objects.filter(id=post.id).update(comments_count=3)
+        self.run_import([json.dumps(record) for record in ARCHIVE])
+        self.assertEqual(AuthorStats.objects.get(author=other).posts, 5)
+        self.assertEqual(Post.objects.get(id=post.id).comments_count, 3)
+        self.assertEqual(Post.objects.get(id=500).comments_count, 1)
+        self.assertEqual(list(search.filter_posts(Post.objects.all(), 'мир')),
+                         [post])
+
+    def test_csv_import(self):
+        out = self.run_import(['author,text,group', 'leo,Пост из CSV,'],
+                              '--format', 'csv', '--type', 'post')
+        self.assertIn('post=1', out)
+        post = Post.objects.get(text='Пост из CSV')
+        self.assertIsNone(post.group)
+        self.assertEqual(list(search.filter_posts(Post.objects.all(), 'CSV')),
+                         [post])
+
+    def test_malformed_record_names_line(self):
+        lines = [json.dumps(ARCHIVE[0]),
+                 json.dumps({'type': 'comment', 'post': 500, 'text': 'Кто?'})]
+        with self.assertRaisesMessage(CommandError,
+                                      'Строка 2: нет полей author.'):
+            self.run_import(lines)
+        with self.assertRaisesMessage(CommandError, 'Строка 2: id не число.'):
+            self.run_import(['author,text,id', 'leo,Пост,первый'],
+                            '--format', 'csv', '--type', 'post')
+
+    def test_created_field_restored_after_import(self):
+        self.run_import([json.dumps(record) for record in ARCHIVE])
+        for model in (Post, Comment):
+            with self.subTest(model=model.__name__):
+                self.assertTrue(
+                    model._meta.get_field('created').auto_now_add)
@@ -0,0 +1,84 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+
+from posts import loadtest
+from posts.management.commands.loadtest import histogram, summarize
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class LoadtestCommandTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(5):
+            Post.objects.create(author=self.author, group=group,
+                                text=f'Пост {number}')
+
+    def test_drives_every_scenario_against_wsgi_server(self):
+        out = StringIO()
+        call_command('loadtest', rates='20', duration=1, clients=2,
+                     server_processes=0, users=1,
+                     mix='browse=4,feed=2,post=1,comment=2,upload=1',
+                     json_path='-', stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        step, = report['steps']
+        self.assertGreater(step['requests'], 0)
+        self.assertEqual(step['errors'], 0)
+        self.assertEqual(sum(step['histogram_ms'].values()),
+                         step['requests'])
+        self.assertEqual(set(step['scenarios']), set(loadtest.SCENARIOS))
+        # Посты и комментарии прошли через CSRF и сессию читателя.
+        written = (step['scenarios']['post']['requests']
+                   + step['scenarios']['upload']['requests'])
+        self.assertEqual(Post.objects.filter(author=self.reader).count(),
+                         written)
+        self.assertEqual(Comment.objects.count(),
+                         step['scenarios']['comment']['requests'])
+        self.assertFalse(Session.objects.exists())
+
+    def test_empty_database_is_an_error(self):
+        Post.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('loadtest', rates='1', duration=0.1,
+                         server_processes=0, stdout=StringIO())
+
+
+class LoadtestHelpersTest(SimpleTestCase):
+    def test_parse_mix(self):
+        self.assertEqual(loadtest.parse_mix('browse=3, feed'),
+                         {'browse': 3.0, 'feed': 1.0})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('crawl=1')
+
+    def test_summarize_splits_rejections_from_errors(self):
+        samples = [('browse', 200, 0.002), ('post', 429, 0.004),
+                   ('post', 500, 0.3), ('feed', 0, 10.0)]
+        result = summarize(samples)
+        self.assertEqual((result['requests'], result['errors'],
+                          result['rejected']), (4, 2, 1))
+        buckets = histogram(seconds for _, _, seconds in samples)
+        self.assertEqual(buckets['<=5'], 2)
+        self.assertEqual(buckets['<=500'], 1)
+        self.assertEqual(buckets['<=10000'], 1)
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts.models import Group, Post
+from posts.templatetags.post_cards import CARD_KEY, card_version, post_cards
+
+User = get_user_model()
+
+
+class PostCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth',
+                                            first_name='Лев')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(3):
+            Post.objects.create(author=cls.user, group=cls.group,
+                                text=f'Пост {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def posts(self):
+        return list(Post.objects.select_related('author', 'group'))
+
+    def card_key(self, post):
+        return CARD_KEY.format(post.id, card_version(post))
+
+    def test_warm_cards_are_read_from_cache(self):
+        posts = self.posts()
+        cold = post_cards(posts)
+        self.assertIn('Пост 2', cold[0][1])
+        cache.set_many({self.card_key(post): 'из кэша' for post in posts})
+        with self.assertNumQueries(0):
+            warm = post_cards(posts)
+        self.assertEqual([card for _, card in warm], ['из кэша'] * 3)
+
+    def test_card_changes_with_author_name(self):
+        posts = self.posts()
+        post_cards(posts)
+        posts[0].author.first_name = 'Фёдор'
+        self.assertIsNone(cache.get(self.card_key(posts[0])))
+        self.assertIn('Фёдор', post_cards(posts)[0][1])
+
+    def test_card_changes_with_post_and_group(self):
+        post = self.posts()[0]
+        old_key = self.card_key(post)
+        post.group.title = 'Новое имя'
+        group_key = self.card_key(post)
+        post.text = 'Новый текст'
+        self.assertEqual(
+            len({old_key, group_key, self.card_key(post)}), 3)
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import graph
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Бюджет SQL-запросов на страницу для авторизованного пользователя:
+# сессия и пользователь плюс запросы самой страницы.
+QUERY_BUDGETS = {
+    'posts:index': 3,
+    'posts:group_list': 4,
+    'posts:profile': 6,
+    'posts:post_detail': 6,
+    'posts:follow_index': 4,
+}
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        # Граф подписок грузится раз на процесс, в бюджет страниц не входит.
+        graph.reset()
+        graph.get_graph()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def add_posts(self, count):
+        """Каждый пост от своего автора — худший случай для N+1."""
+        for number in range(count):
+            author = User.objects.create_user(
+                username=f'author{Post.objects.count()}',
+                first_name='Имя', last_name='Фамилия'
+            )
+            Follow.objects.create(user=self.reader, author=author)
+            post = Post.objects.create(author=author, text='Пост',
+                                       group=self.group)
+            Comment.objects.create(post=post, author=author, text='Да')
+        return post
+
+    def urls(self, post):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse('posts:group_list',
+                                        kwargs={'slug': self.group.slug}),
+            'posts:profile': reverse('posts:profile',
+                                     kwargs={'username': post.author}),
+            'posts:post_detail': reverse('posts:post_detail',
+                                         kwargs={'post_id': post.id}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page(self):
+        post = self.add_posts(1)
+        small = {name: self.count_queries(url)
+                 for name, url in self.urls(post).items()}
+        post = self.add_posts(15)
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text='Ещё')
+            for _ in range(5)
+        )
+        for name, url in self.urls(post).items():
+            with self.subTest(name=name):
+                self.assertEqual(self.count_queries(url), small[name])
+
+    def test_query_budgets(self):
+        post = self.add_posts(12)
+        for name, url in self.urls(post).items():
+            with self.subTest(name=name):
+                self.assertLessEqual(self.count_queries(url),
+                                     QUERY_BUDGETS[name])
@@ -0,0 +1,80 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from posts import plans
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryPlansTest(TestCase):
+    """Горячие запросы страниц идут по индексам и не сортируют в памяти."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('seed_dataset', users=60, groups=4, posts=400,
+                     comments=600, follows_mean=6, celebrities=2,
+                     image_share=0, workers=1, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_views_use_indexes(self):
+        out = StringIO()
+        call_command('explain_views', json_path='-', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertIn('group_posts (дальше)', report)
+        self.assertIn('comment_thread', report)
+        for name, queries in report.items():
+            for query in queries:
+                with self.subTest(view=name, sql=query['sql'][:60]):
+                    self.assertEqual(query['problems'], [])
+        indexes = {index for query in report['group_posts']
+                   for index in query['indexes']}
+        self.assertIn('post_group_created_idx', indexes)
+
+
+class PlanRulesTest(SimpleTestCase):
+    tables = {'posts_post', 'posts_comment'}
+
+    def test_full_scan_and_temp_sort_are_problems(self):
+        plan = ['SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY']
+        self.assertEqual(plans.problems(plan, self.tables), plan)
+
+    def test_index_scans_and_subqueries_are_fine(self):
+        plan = ['SCAN posts_post USING INDEX post_created_id_idx',
+                'SCAN (subquery-1)',
+                'SEARCH posts_comment USING COVERING INDEX '
+                'comment_post_path_idx (post_id=? AND path>?)']
+        self.assertEqual(plans.problems(plan, self.tables), [])
+        self.assertEqual(plans.indexes(plan),
+                         ['post_created_id_idx', 'comment_post_path_idx'])
+
+    def test_full_text_ranking_may_sort(self):
+        plan = ['SCAN posts_post_fts VIRTUAL TABLE INDEX 0:M1',
+                'USE TEMP B-TREE FOR ORDER BY']
+        sql = ('SELECT rowid, rank FROM posts_post_fts WHERE posts_post_fts '
+               'MATCH %s ORDER BY rank ASC, rowid ASC LIMIT %s')
+        self.assertEqual(plans.problems(plan, self.tables, sql), [])
+        self.assertEqual(plans.problems(plan, self.tables), plan[1:])
+
+    def test_other_sorts_next_to_full_text_are_problems(self):
+        plan = ['SCAN posts_post_fts VIRTUAL TABLE INDEX 0:M1',
+                'SEARCH posts_post USING INTEGER PRIMARY KEY (rowid=?)',
+                'USE TEMP B-TREE FOR ORDER BY']
+        sql = ('SELECT posts_post.id FROM posts_post_fts JOIN posts_post '
+               'ON posts_post.id = posts_post_fts.rowid WHERE '
+               'posts_post_fts MATCH %s ORDER BY posts_post.created DESC')
+        self.assertEqual(plans.problems(plan, self.tables, sql), plan[2:])
+        ranked = sql.replace('posts_post.created DESC', 'rank')
+        self.assertEqual(plans.problems(plan, self.tables, ranked),
+                         plan[2:])
@@ -0,0 +1,91 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from core.ratelimit import hit, parse_rate
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(RATE_LIMITS={'add_comment': '2/m',
+                                'profile_follow': '1/h'})
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='spammer')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def comment(self):
+        return self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Спам'})
+
+    def test_excess_requests_are_rejected(self):
+        self.comment()
+        self.comment()
+        response = self.comment()
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(
+            metrics.snapshot()['ratelimit_add_comment_rejected'], 1)
+
+    def test_rejected_before_database_work(self):
+        self.comment()
+        self.comment()
+        # Сессия и пользователь для login_required, дальше — ни запроса.
+        with self.assertNumQueries(2):
+            self.comment()
+
+    def test_buckets_are_per_user(self):
+        self.comment()
+        self.comment()
+        other = Client()
+        other.force_login(self.author)
+        response = other.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Не спам'})
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_follow_is_limited(self):
+        url = reverse('posts:profile_follow', kwargs={'username': 'author'})
+        self.client.get(url)
+        Follow.objects.all().delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_bucket_refills(self):
+        capacity, period = parse_rate('2/m')
+        for _ in range(capacity):
+            self.assertTrue(hit('test', 'ip:1', capacity, period, now=60)[0])
+        self.assertFalse(hit('test', 'ip:1', capacity, period, now=60)[0])
+        # Через половину следующего окна вернулась половина ведра.
+        self.assertTrue(hit('test', 'ip:1', capacity, period, now=150)[0])
+        self.assertFalse(hit('test', 'ip:1', capacity, period, now=150)[0])
+        self.assertTrue(hit('test', 'ip:1', capacity, period, now=240)[0])
+
+    def test_rejection_survives_evicted_window(self):
+        self.assertTrue(hit('test', 'ip:1', 1, 60, now=60)[0])
+        # Ключ окна вытеснен между incr и decr.
+        with mock.patch.object(cache, 'decr', side_effect=ValueError):
+            self.assertFalse(hit('test', 'ip:1', 1, 60, now=60)[0])
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('100/5m'), (100, 300))
@@ -0,0 +1,123 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import routers
+from core.querylog import read_samples
+from posts.models import Post
+
+User = get_user_model()
+
+REPLICA = 'replica'
+
+
+@override_settings(REPLICA_DATABASES={REPLICA: {}}, RATE_LIMITS={})
+class ReplicaRoutingTest(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections.databases[REPLICA] = dict(
+            connection.settings_dict,
+            NAME=os.path.join(directory.name, 'replica.sqlite3'))
+        self.addCleanup(self.drop_replica)
+        self.author = User.objects.create_user(username='author')
+        Post.objects.create(author=self.author, text='Старый пост')
+        self.sync()
+        self.client.force_login(self.author)
+
+    def drop_replica(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def sync(self):
+        call_command('sync_replicas', stdout=StringIO())
+        cache.clear()
+
+    def index_texts(self, client):
+        response = client.get(reverse('posts:index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_feed_reads_from_replica(self):
+        Post.objects.create(author=self.author, text='Новый пост')
+        cache.clear()
+        self.assertEqual(self.index_texts(self.client_class()),
+                         ['Старый пост'])
+        self.sync()
+        self.assertEqual(self.index_texts(self.client_class()),
+                         ['Новый пост', 'Старый пост'])
+
+    def test_author_sees_own_post_after_create(self):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Свой пост'})
+        self.assertTrue(Post.objects.filter(text='Свой пост').exists())
+        self.assertIn('Свой пост', self.index_texts(self.client))
+        self.assertNotIn('Свой пост', self.index_texts(self.client_class()))
+
+    def test_stickiness_expires(self):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Свой пост'})
+        del self.client.cookies[routers.STICKY_COOKIE]
+        self.assertNotIn('Свой пост', self.index_texts(self.client))
+
+    def test_pin_travels_with_request_not_process_cache(self):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Свой пост'})
+        # Другой процесс: своего кэша с отметкой у него нет.
+        cache.clear()
+        self.assertIn('Свой пост', self.index_texts(self.client))
+
+    def test_pin_is_signed_and_personal(self):
+        Post.objects.create(author=self.author, text='Новый пост')
+        cache.clear()
+        self.client.cookies[routers.STICKY_COOKIE] = str(self.author.id)
+        self.assertNotIn('Новый пост', self.index_texts(self.client))
+        other = self.client_class()
+        other.force_login(User.objects.create_user(username='other'))
+        other.post(reverse('posts:post_create'), {'text': 'Чужой пост'})
+        self.client.cookies[routers.STICKY_COOKIE] = (
+            other.cookies[routers.STICKY_COOKIE].value)
+        self.assertNotIn('Новый пост', self.index_texts(self.client))
+
+    def test_query_samples_cover_replica(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, 'samples.jsonl')
+            with override_settings(QUERY_SAMPLE_RATE=1,
+                                   QUERY_SAMPLE_LOG=log):
+                self.client_class().get(reverse('posts:index'))
+            databases = {sample['db'] for sample in read_samples(log)}
+        self.assertIn(REPLICA, databases)
+
+    def test_other_pages_read_primary(self):
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'Новый'})
+        self.assertEqual([post.text for post in response.context['page_obj']],
+                         ['Новый пост'])
+
+
+class ReplicaRouterTest(TransactionTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        routers._state.alias = REPLICA
+        self.addCleanup(setattr, routers._state, 'alias', None)
+
+    def test_reads_go_to_replica_writes_to_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), REPLICA)
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_reads_inside_transaction_stay_on_primary(self):
+        with transaction.atomic():
+            self.assertIsNone(self.router.db_for_read(Post))
+
+    @override_settings(REPLICA_DATABASES={REPLICA: {}})
+    def test_no_migrations_on_replica(self):
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
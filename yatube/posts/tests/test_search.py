@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.best = Post.objects.create(author=cls.user,
+                                       text='Кот кот кот и пёс')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Долгая история про пса, где кот упомянут '
+                                  'лишь однажды среди множества слов')
+        cls.unrelated = Post.objects.create(author=cls.user,
+                                            text='Про погоду')
+
+    def found(self, query, params=''):
+        response = self.client.get(
+            reverse('posts:search') + f'?q={query}{params}')
+        return response.context['page_obj']
+
+    def test_results_ranked_by_bm25(self):
+        self.assertEqual([post.id for post in self.found('кот')],
+                         [self.best.id, self.other.id])
+
+    def test_index_follows_edits_and_deletes(self):
+        unrelated = Post.objects.get(pk=self.unrelated.pk)
+        unrelated.text = 'Теперь и тут кот'
+        unrelated.save()
+        Post.objects.get(pk=self.best.pk).delete()
+        self.assertEqual({post.id for post in self.found('кот')},
+                         {self.other.id, self.unrelated.id})
+        self.assertEqual(list(self.found('погоду')), [])
+
+    def test_operators_in_query_are_plain_words(self):
+        self.assertEqual(list(self.found('"кот*')), [self.best, self.other])
+        self.assertEqual(list(self.found('кот OR погоду')), [])
+        self.assertEqual(list(self.found('')), [])
+
+    def test_results_are_cursor_paginated(self):
+        posts = [Post.objects.create(author=self.user, text=f'слон {number}')
+                 for number in range(12)]
+        first_page = self.found('слон')
+        cursor = first_page.paginator.next_cursor
+        second_page = self.found('слон', f'&after={cursor}')
+        ids = [post.id for post in first_page] + [
+            post.id for post in second_page]
+        self.assertEqual(sorted(ids), [post.id for post in posts])
+
+    def test_admin_search_uses_index(self):
+        queryset = search.filter_posts(Post.objects.all(), 'пёс')
+        self.assertEqual(list(queryset), [self.best])
+
+    def test_filter_posts_returns_every_match(self):
+        queryset = search.filter_posts(Post.objects.all(), 'кот')
+        self.assertEqual(set(queryset), {self.best, self.other})
+        self.assertEqual(queryset.count(), 2)
+        # IN ((SELECT ...)) сравнивал бы id только с первой строкой.
+        self.assertNotIn('((SELECT', str(queryset.query))
+
+    def test_rebuild_command(self):
+        search.clear_index()
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=2, stdout=out)
+        self.assertIn('Проиндексировано постов: 3', out.getvalue())
+        self.assertEqual(len(self.found('кот')), 2)
@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from posts.models import AuthorStats, Comment, FeedEntry, Follow, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedDatasetTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        out = StringIO()
+        call_command('seed_dataset', users=100, groups=5, posts=300,
+                     comments=450, follows_mean=8, celebrities=3,
+                     image_share=0.2, chunk_size=50, stdout=out, **options)
+        return out.getvalue()
+
+    def test_creates_requested_sizes(self):
+        out = self.seed(workers=2)
+        self.assertIn('posts=300', out)
+        self.assertEqual(User.objects.count(), 100)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 450)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+
+    def test_shape_is_skewed(self):
+        self.seed(workers=1, skip_feeds=True)
+        followers = sorted(AuthorStats.objects.values_list('followers',
+                                                           flat=True),
+                           reverse=True)
+        # Три звезды собирают больше подписок, чем половина авторов.
+        self.assertGreater(sum(followers[:3]), sum(followers[-50:]))
+        with_images = Post.objects.exclude(image='').count()
+        self.assertTrue(30 < with_images < 90)
+        per_post = Counter(Comment.objects.values_list('post_id', flat=True))
+        self.assertGreater(per_post.most_common(1)[0][1], 450 / 300 * 10)
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')).exists())
+
+    def test_is_deterministic(self):
+        self.seed(workers=2, skip_feeds=True)
+        texts = list(Post.objects.order_by('id')
+                     .values_list('text', flat=True)[:20])
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        self.seed(workers=1, skip_feeds=True)
+        self.assertEqual(list(Post.objects.order_by('id')
+                              .values_list('text', flat=True)[:20]), texts)
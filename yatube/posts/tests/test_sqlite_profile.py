@@ -0,0 +1,87 @@
+import json
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core.backends.sqlite3.base import DatabaseWrapper
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ProductionProfileTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'profile.sqlite3')
+
+    def wrapper(self, **options):
+        production = settings.DATABASE_PROFILES['production']
+        database = dict(connection.settings_dict, NAME=self.path,
+                        ENGINE=production['ENGINE'],
+                        OPTIONS=dict(production['OPTIONS'], **options))
+        wrapper = DatabaseWrapper(database, alias='profile')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        wrapper = self.wrapper()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -64 * 1024)
+        # synchronous=NORMAL
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+
+    def test_atomic_takes_write_lock_at_begin(self):
+        wrapper = self.wrapper()
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id integer primary key)')
+        other = sqlite3.connect(self.path, timeout=0,
+                                isolation_level=None)
+        self.addCleanup(other.close)
+        # atomic() в режиме autocommit начинает транзакцию этим методом.
+        wrapper._start_transaction_under_autocommit()
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+            other.execute('BEGIN IMMEDIATE')
+        wrapper.cursor().execute('ROLLBACK')
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+    def test_unknown_transaction_mode(self):
+        wrapper = self.wrapper(transaction_mode='LAZY')
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.ensure_connection()
+
+
+class BenchmarkSqliteCommandTest(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(Post(author=author, text=f'Пост {number}')
+                                 for number in range(30))
+
+    def test_compares_profiles_on_copies(self):
+        out = StringIO()
+        call_command('benchmark_sqlite', readers=2, writers=2, duration=0.3,
+                     json_path='-', stdout=out)
+        profiles = json.loads(out.getvalue())['profiles']
+        self.assertEqual(profiles['baseline']['journal_mode'], 'delete')
+        self.assertEqual(profiles['production']['journal_mode'], 'wal')
+        production = profiles['production']
+        self.assertGreater(production['read']['ops'], 0)
+        self.assertGreater(production['write']['ops'], 0)
+        self.assertEqual(production['write']['errors'], 0)
+        # Копии не трогают основную базу.
+        self.assertEqual(Post.objects.get(text='Пост 0').comments_count, 0)
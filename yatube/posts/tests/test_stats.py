@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import stats
+from posts.models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(author=user)
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Ещё пост')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        stats = self.stats(self.author)
+        self.assertEqual(
+            (stats.posts, stats.followers, stats.comments_received),
+            (2, 1, 1)
+        )
+        self.assertEqual(self.stats(self.reader).following, 1)
+        post.delete()
+        follow.delete()
+        stats = self.stats(self.author)
+        self.assertEqual(
+            (stats.posts, stats.followers, stats.comments_received),
+            (1, 0, 0)
+        )
+        self.assertEqual(self.stats(self.reader).following, 0)
+
+    def test_counter_is_single_row_read(self):
+        Post.objects.create(author=self.author, text='Пост')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.stats(self.author).posts, 1)
+
+    def test_command_repairs_drift(self):
+        Post.objects.create(author=self.author, text='Пост')
+        AuthorStats.objects.filter(author=self.author).update(posts=42)
+        AuthorStats.objects.filter(author=self.reader).delete()
+        out = StringIO()
+        call_command('recount_author_stats', chunk_size=1, stdout=out)
+        self.assertEqual(self.stats(self.author).posts, 1)
+        self.assertEqual(self.stats(self.reader).posts, 0)
+        self.assertIn('исправлено: 2', out.getvalue())
+
+    def test_drifted_counter_does_not_go_negative(self):
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.filter(author=self.author).update(followers=0)
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers, 0)
+
+    def test_bump_creates_missing_row_once(self):
+        AuthorStats.objects.filter(author=self.author).delete()
+        Post.objects.create(author=self.author, text='Пост')
+        stats.bump(self.author.id, posts=1)
+        self.assertEqual(self.stats(self.author).posts, 2)
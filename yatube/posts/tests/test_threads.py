@@ -0,0 +1,169 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import COMMENT_MAX_DEPTH, Comment, Post
+from posts.threads import (THREAD_PAGE_SIZE, attach_replies,
+                           fill_root_paths, subtree, subtree_page)
+
+User = get_user_model()
+
+# Объём «вирусного» поста: ветки должны читаться одним запросом
+# по индексу независимо от него. Независимость проверяют число запросов
+# и план, поэтому данных ровно столько, чтобы ветка не влезла в порцию.
+BIG_THREAD_ROOTS = 20
+BIG_THREAD_REPLIES = 99
+
+
+class CommentThreadsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.root = Comment.objects.create(post=cls.post, author=cls.author,
+                                          text='Корень')
+        cls.reply = Comment.objects.create(parent=cls.root,
+                                           author=cls.author, text='Ответ')
+        cls.nested = Comment.objects.create(parent=cls.reply,
+                                            author=cls.author,
+                                            text='Ответ на ответ')
+        cls.other = Comment.objects.create(post=cls.post, author=cls.author,
+                                           text='Другая ветка')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_path_and_depth(self):
+        self.assertEqual(self.root.depth, 0)
+        self.assertEqual(self.nested.depth, 2)
+        self.assertTrue(self.nested.path.startswith(self.reply.path))
+        self.assertEqual(self.nested.post_id, self.post.id)
+
+    def test_subtree_is_one_range_query(self):
+        with self.assertNumQueries(1):
+            replies = list(subtree(self.root))
+        self.assertEqual(replies, [self.reply, self.nested])
+
+    def test_subtree_is_paged_by_path(self):
+        replies, after = subtree_page(self.root, limit=1)
+        self.assertEqual(replies, [self.reply])
+        self.assertEqual(after, self.reply.path)
+        replies, after = subtree_page(self.root, after, limit=1)
+        self.assertEqual(replies, [self.nested])
+        self.assertIsNone(after)
+
+    def test_thread_endpoint_continues_after_path(self):
+        response = self.client.get(
+            reverse('posts:comment_thread',
+                    kwargs={'post_id': self.post.id,
+                            'comment_id': self.root.id}),
+            {'after': self.reply.path})
+        self.assertEqual(response.context['replies'], [self.nested])
+        self.assertIsNone(response.context['next_after'])
+        self.assertNotContains(response, 'Ещё ответы')
+
+    def test_depth_is_limited(self):
+        comment = self.root
+        for _ in range(COMMENT_MAX_DEPTH + 2):
+            comment = Comment.objects.create(parent=comment,
+                                             author=self.author, text='Ещё')
+        self.assertEqual(comment.depth, COMMENT_MAX_DEPTH - 1)
+
+    def test_reply_through_view(self):
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Ответ из формы', 'parent': self.other.id})
+        reply = Comment.objects.get(text='Ответ из формы')
+        self.assertEqual(reply.parent, self.other)
+        self.assertEqual(reply.depth, 1)
+
+    def test_post_detail_shows_threads(self):
+        response = self.author_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        roots = list(response.context['comments'])
+        self.assertEqual(roots, [self.other, self.root])
+        self.assertEqual(roots[1].first_replies, [self.reply, self.nested])
+        self.assertContains(response, 'Ответ на ответ')
+
+    def test_fill_root_paths(self):
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.author, text='Импорт')
+        ])
+        self.assertEqual(fill_root_paths(), 1)
+        imported = Comment.objects.get(text='Импорт')
+        self.assertEqual(imported.path, Comment.path_for('', imported.id))
+
+
+class BigThreadsTest(TestCase):
+    """Пост с 2000 комментариев: 20 веток по 99 ответов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        comments, pk = [], 0
+        for _ in range(BIG_THREAD_ROOTS):
+            pk += 1
+            root_path = Comment.path_for('', pk)
+            comments.append(Comment(id=pk, post=cls.post, author=cls.author,
+                                    text='Ветка', path=root_path))
+            parent = pk
+            for _ in range(BIG_THREAD_REPLIES):
+                pk += 1
+                comments.append(Comment(
+                    id=pk, post=cls.post, author=cls.author, text='Ответ',
+                    parent_id=parent, depth=1,
+                    path=Comment.path_for(root_path, pk)))
+        Comment.objects.bulk_create(comments)
+        cls.root = Comment.objects.get(id=1)
+
+    def test_comment_count(self):
+        self.assertEqual(
+            Comment.objects.filter(post=self.post).count(),
+            BIG_THREAD_ROOTS * (BIG_THREAD_REPLIES + 1))
+
+    def test_whole_thread_in_one_query(self):
+        with self.assertNumQueries(1):
+            replies = list(subtree(self.root).values_list('id', flat=True))
+        self.assertEqual(replies, list(range(2, BIG_THREAD_REPLIES + 2)))
+
+    def test_top_threads_with_first_replies_in_two_queries(self):
+        with self.assertNumQueries(2):
+            roots = list(Comment.objects.filter(post=self.post, depth=0)
+                         .order_by('-created', '-id')[:10])
+            attach_replies(roots, per_thread=3)
+        for root in roots:
+            self.assertEqual([reply.id for reply in root.first_replies],
+                             [root.id + 1, root.id + 2, root.id + 3])
+            self.assertTrue(root.more_replies)
+
+    def test_thread_endpoint_reads_one_page(self):
+        url = reverse('posts:comment_thread',
+                      kwargs={'post_id': self.post.id,
+                              'comment_id': self.root.id})
+        # Комментарий с постом и порция ветки.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        replies = response.context['replies']
+        self.assertEqual(len(replies), THREAD_PAGE_SIZE)
+        self.assertEqual(response.context['next_after'], replies[-1].path)
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'after': replies[-1].path})
+        self.assertEqual(len(response.context['replies']),
+                         BIG_THREAD_REPLIES - THREAD_PAGE_SIZE)
+        self.assertIsNone(response.context['next_after'])
+
+    def test_thread_queries_use_path_index(self):
+        queryset = subtree(self.root)
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('comment_post_path_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,110 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def detail_html(self):
+        return self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )).content.decode()
+
+    def test_placeholder_until_generated(self):
+        self.assertIn('thumbnail-placeholder', self.detail_html())
+        self.assertIsNone(thumbnails.ready_thumbnail(self.post.image,
+                                                     'card'))
+        thumbnails.enqueue(self.post.image.name)
+        thumbnail = thumbnails.ready_thumbnail(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        html = self.detail_html()
+        self.assertNotIn('thumbnail-placeholder', html)
+        self.assertIn(thumbnail.url, html)
+
+    def test_backfill_command(self):
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0, stdout=out)
+        self.assertIn('Обработано картинок: 1, ошибок: 0', out.getvalue())
+
+    @override_settings(THUMBNAIL_EXTERNAL=True)
+    def test_external_mode_leaves_generation_to_command(self):
+        thumbnails.enqueue(self.post.image.name)
+        self.assertIsNone(thumbnails.ready_thumbnail(self.post.image))
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0, missing=True,
+                     stdout=out)
+        self.assertIn('Обработано картинок: 1, ошибок: 0', out.getvalue())
+        self.assertIsNotNone(thumbnails.ready_thumbnail(self.post.image))
+        out = StringIO()
+        call_command('pregenerate_thumbnails', workers=0, missing=True,
+                     stdout=out)
+        self.assertIn('Обработано картинок: 0, ошибок: 0', out.getvalue())
+
+    def thumbnail_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return [query for query in queries
+                if 'posts_thumbnail' in query['sql']]
+
+    def test_feed_page_reads_thumbnails_in_one_batch(self):
+        for number in range(9):
+            post = Post.objects.create(
+                author=self.user, text=f'Пост {number}',
+                image=SimpleUploadedFile(f'small{number}.gif', SMALL_GIF,
+                                         'image/gif'),
+            )
+            thumbnails.enqueue(post.image.name)
+        cache.clear()
+        index = reverse('posts:index')
+        self.assertEqual(len(self.thumbnail_queries(index)), 1)
+        images = [post.image for post in
+                  Post.objects.exclude(pk=self.post.pk)]
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.prefetch_thumbnails(images)
+        with self.assertNumQueries(0):
+            found = thumbnails.prefetch_thumbnails(images)
+        self.assertEqual(len(found), 9)
@@ -5,6 +5,8 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 import tempfile
 import shutil
 
@@ -159,15 +161,63 @@ class PostsURLTests(TestCase):
     def test_index_page_cache(self):
         cached_page = self.authorized_client.get(
             reverse('posts:index')).content
-        Post.objects.create(text='Новый пост', author=self.user)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
         response = self.authorized_client.get(
             reverse('posts:index')).content
         self.assertEqual(cached_page, response)
-        cache.clear()
+        Post.objects.create(text='Новый пост', author=self.user)
         updated_response = self.authorized_client.get(
             reverse('posts:index')
         ).content
         self.assertNotEqual(cached_page, updated_response)
+        self.assertIn('Новый пост', updated_response.decode())
+
+    def test_feed_caches_invalidated_by_post_edit(self):
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:group_list',
+                    kwargs={'slug': self.another_group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        self.post.text = 'Перенесённый пост'
+        self.post.group = self.another_group
+        self.post.save()
+        old_group, new_group, profile = (
+            self.authorized_client.get(url).content.decode() for url in urls
+        )
+        self.assertNotIn('Перенесённый пост', old_group)
+        self.assertIn('Перенесённый пост', new_group)
+        self.assertIn('Перенесённый пост', profile)
+
+    def test_author_rename_invalidates_feeds(self):
+        self.authorized_client.get(reverse('posts:index'))
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn('Переименованный', response.content.decode())
+
+    def test_cached_feed_keeps_viewer_parts(self):
+        Follow.objects.create(user=self.user, author=self.another_user)
+        url = reverse('posts:profile',
+                      kwargs={'username': self.another_user.username})
+        first = self.authorized_unfollow_client.get(url).content.decode()
+        self.assertIn('Подписаться', first)
+        page = self.authorized_client.get(url).content.decode()
+        self.assertIn('Отписаться', page)
+        self.assertIn(f'Пользователь: {self.user.username}', page)
+        self.assertIn('Пост автора', page)
+
+    def test_cached_feed_skips_page_queries(self):
+        # Журнал запросов чистится в начале каждого запроса к сайту,
+        # поэтому число снимаем сразу.
+        with CaptureQueriesContext(connection) as cold:
+            self.authorized_client.get(reverse('posts:index'))
+        cold_count = len(cold)
+        with CaptureQueriesContext(connection) as warm:
+            self.authorized_client.get(reverse('posts:index'))
+        self.assertLess(len(warm), cold_count)
 
     def test_following(self):
         self.authorized_client.get(reverse(
@@ -217,13 +267,18 @@ class PaginatorViewsTest(TestCase):
         self.authorized_client.force_login(self.user)
         cache.clear()
 
+    def get_second_page(self, url):
+        cache.clear()
+        first_page = self.authorized_client.get(url)
+        cursor = first_page.context['page_obj'].paginator.next_cursor
+        return self.authorized_client.get(url + f'?after={cursor}')
+
     def test_first_page_contains_ten_posts(self):
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), 10)
 
     def test_second_page_contains_three_posts(self):
-        response = self.authorized_client.get(
-            reverse('posts:index') + '?page=2')
+        response = self.get_second_page(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), 3)
 
     def test_first_page_of_group_contains_ten_posts(self):
@@ -232,9 +287,8 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 10)
 
     def test_second_page_of_group_contains_three_posts(self):
-        response = self.authorized_client.get(
-            reverse('posts:group_list',
-                    kwargs={'slug': self.group.slug}) + '?page=2',)
+        response = self.get_second_page(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
         self.assertEqual(len(response.context['page_obj']), 3)
 
     def test_first_page_of_user_contains_ten_posts(self):
@@ -243,7 +297,30 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 10)
 
     def test_second_page_of_user_contains_three_posts(self):
-        response = self.authorized_client.get(
-            reverse('posts:profile', kwargs={'username': self.user.username})
-            + '?page=2',)
+        response = self.get_second_page(
+            reverse('posts:profile', kwargs={'username': self.user.username}))
         self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_pages_do_not_overlap(self):
+        url = reverse('posts:index')
+        first_page = self.authorized_client.get(url).context['page_obj']
+        second_page = self.get_second_page(url).context['page_obj']
+        ids = [post.id for post in first_page] + [
+            post.id for post in second_page]
+        self.assertEqual(ids, list(range(12, -1, -1)))
+        self.assertIsNone(second_page.paginator.next_cursor)
+
+    def test_previous_page_returns_first_page(self):
+        url = reverse('posts:index')
+        second_page = self.get_second_page(url).context['page_obj']
+        cursor = second_page.paginator.previous_cursor
+        response = self.authorized_client.get(url + f'?before={cursor}')
+        page_obj = response.context['page_obj']
+        self.assertEqual([post.id for post in page_obj],
+                         list(range(12, 2, -1)))
+        self.assertIsNone(page_obj.paginator.previous_cursor)
+
+    def test_broken_cursor_shows_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?after=broken')
+        self.assertEqual(len(response.context['page_obj']), 10)
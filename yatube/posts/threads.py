@@ -0,0 +1,99 @@
+"""Ветки комментариев на материализованном пути.
+
+Путь комментария — id всех его предков и его собственный фиксированной
+ширины, поэтому ветка целиком — один диапазон по индексу (post, path),
+а порядок строк по ``path`` — это обход дерева в глубину.
+"""
+from collections import defaultdict
+
+from .models import COMMENT_PATH_STEP, Comment
+from .utils import InSubquery
+
+REPLIES_PER_THREAD = 3
+THREAD_PAGE_SIZE = 50
+
+
+def subtree_range(path):
+    """Границы [от, до) путей всех потомков комментария с путём ``path``."""
+    return path, path + ':'
+
+
+def subtree(comment, include_self=False):
+    """Ветка под комментарием в порядке обхода, одним запросом."""
+    low, high = subtree_range(comment.path)
+    lookup = 'path__gte' if include_self else 'path__gt'
+    return Comment.objects.filter(
+        post_id=comment.post_id, path__lt=high, **{lookup: low}
+    ).order_by('path')
+
+
+def subtree_page(comment, after='', limit=THREAD_PAGE_SIZE):
+    """Порция ветки после пути ``after`` и путь, с которого читать дальше.
+
+    Курсор — сам путь, ключ индекса (post, path): каждая порция — короткий
+    диапазон, сколько бы ответов ни было в ветке.
+    """
+    replies = subtree(comment).select_related('author')
+    if after:
+        replies = replies.filter(path__gt=after)
+    replies = list(replies[:limit + 1])
+    if len(replies) > limit:
+        return replies[:limit], replies[limit - 1].path
+    return replies, None
+
+
+def first_replies_sql(roots, limit):
+    """Первые ``limit`` ответов каждой ветки: UNION ALL коротких диапазонов.
+
+    Каждая часть — поиск по индексу с LIMIT, так что цена не зависит
+    от размера веток.
+    """
+    branch = (f'SELECT id FROM (SELECT id FROM {Comment._meta.db_table} '
+              'WHERE post_id = %s AND path > %s AND path < %s '
+              'ORDER BY path LIMIT %s)')
+    params = []
+    for root in roots:
+        params += [root.post_id, *subtree_range(root.path), limit]
+    return InSubquery(' UNION ALL '.join([branch] * len(roots)), params)
+
+
+def attach_replies(roots, per_thread=REPLIES_PER_THREAD):
+    """Кладёт в ``root.first_replies`` начало ветки каждого корня.
+
+    ``root.more_replies`` говорит, что в ветке есть ещё ответы.
+    """
+    roots = list(roots)
+    if not roots:
+        return roots
+    replies = (Comment.objects
+               .filter(id__in=first_replies_sql(roots, per_thread + 1))
+               .select_related('author').order_by())
+    # Строк не больше (per_thread + 1) на корень: сортируем их здесь,
+    # чтобы база не строила для ORDER BY временное B-дерево.
+    threads = defaultdict(list)
+    for reply in sorted(replies, key=lambda reply: reply.path):
+        threads[reply.path[:COMMENT_PATH_STEP]].append(reply)
+    for root in roots:
+        thread = threads[root.path[:COMMENT_PATH_STEP]]
+        root.first_replies = thread[:per_thread]
+        root.more_replies = len(thread) > per_thread
+    return roots
+
+
+def fill_root_paths(batch_size=1000):
+    """Проставляет пути комментариям, созданным в обход ``save()``.
+
+    ``bulk_create`` не знает id заранее, поэтому такие комментарии
+    остаются корневыми с пустым путём до этого вызова.
+    """
+    filled, last_id = 0, 0
+    while True:
+        batch = list(Comment.objects.filter(path='', id__gt=last_id)
+                     .only('id').order_by('id')[:batch_size])
+        if not batch:
+            return filled
+        for comment in batch:
+            comment.path = Comment.path_for('', comment.id)
+        Comment.objects.bulk_update(batch, ['path'])
+        filled += len(batch)
+        last_id = batch[-1].id
@@ -0,0 +1,120 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Миниатюры строит публичный ``get_thumbnail`` sorl, а имя готового
+файла записывается в ``Thumbnail``: шаблоны читают только эту таблицу
+и не зависят от того, как sorl называет файлы.
+"""
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import cache as feed_cache
+from .models import Thumbnail
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_KEY = 'thumbnail:{}:{}'
+
+_executor = None
+
+
+def _init_worker():
+    # Процесс-потомок не должен пользоваться соединениями родителя.
+    django.setup()
+    connections.close_all()
+
+
+def make_executor(workers):
+    return ProcessPoolExecutor(max_workers=workers,
+                               initializer=_init_worker)
+
+
+def get_executor():
+    """Общий пул процесса веб-сервера, создаётся при первой задаче."""
+    global _executor
+    if _executor is None:
+        _executor = make_executor(settings.THUMBNAIL_WORKERS)
+    return _executor
+
+
+def _key(image_name, size):
+    digest = hashlib.md5(image_name.encode()).hexdigest()
+    return THUMBNAIL_KEY.format(size, digest)
+
+
+def generate(image_name):
+    """Строит все размеры из POST_THUMBNAIL_SIZES для одной картинки."""
+    for size, (geometry, options) in settings.POST_THUMBNAIL_SIZES.items():
+        try:
+            thumbnail = get_thumbnail(image_name, geometry, **options)
+        except Exception:
+            logger.exception('Не удалось построить миниатюру %s', image_name)
+            return False
+        Thumbnail.objects.update_or_create(
+            image=image_name, size=size, defaults={'name': thumbnail.name})
+        cache.delete(_key(image_name, size))
+    return True
+
+
+def enqueue(image_name, scopes=()):
+    """Строит миниатюры в пуле и сбрасывает кэш лент, где была заглушка.
+
+    Сброс делает процесс, поставивший задачу. Соседние процессы с
+    LocMemCache его не видят и показывают заглушку, пока не истечёт
+    FEED_CACHE_TIMEOUT; с общим кэшем сброс виден всем.
+    """
+    if settings.THUMBNAIL_EXTERNAL:
+        return None
+    if not settings.THUMBNAIL_WORKERS:
+        generate(image_name)
+        feed_cache.bump(*scopes)
+        return None
+    future = get_executor().submit(generate, image_name)
+    future.add_done_callback(lambda _: feed_cache.bump(*scopes))
+    return future
+
+
+def schedule(post):
+    """Ставит картинку поста в очередь после фиксации транзакции."""
+    if post.image:
+        image_name = post.image.name
+        scopes = feed_cache.post_scopes(
+            post, post.group.slug if post.group_id else None)
+        transaction.on_commit(lambda: enqueue(image_name, scopes))
+
+
+def prefetch_thumbnails(images, size='card'):
+    """Готовые миниатюры для всех картинок страницы: {имя: ImageFile}.
+
+    Имена файлов читаются из кэша одним ``get_many``, промахи
+    добираются из ``Thumbnail`` одним запросом. Отсутствие миниатюры не
+    кэшируется: её может достроить другой процесс.
+    """
+    keys = {_key(image.name, size): image.name for image in images if image}
+    names = cache.get_many(list(keys))
+    missing = [keys[key] for key in keys if key not in names]
+    if missing:
+        found = {
+            _key(image, size): name for image, name in
+            Thumbnail.objects.filter(size=size, image__in=missing)
+            .values_list('image', 'name')
+        }
+        cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        names.update(found)
+    return {keys[key]: ImageFile(name, default.storage)
+            for key, name in names.items()}
+
+
+def ready_thumbnail(image, size='card'):
+    """Готовая миниатюра картинки или None, если её ещё нет."""
+    if not image:
+        return None
+    return prefetch_thumbnails([image], size).get(image.name)
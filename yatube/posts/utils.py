@@ -1,11 +1,141 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.dateparse import parse_datetime
 
 
 QUANTTIY_OF_POSTS = 10
+CURSOR_KEYS = ('created', 'id')
+
+
+def pack_token(*parts):
+    """Упаковывает части ключа в непрозрачный токен для URL."""
+    raw = '|'.join(map(str, parts)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def unpack_token(token):
+    """Части ключа из токена или None, если токен битый."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return raw.decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class InSubquery(RawSQL):
+    """Сырой подзапрос для ``__in``.
+
+    Lookup сам берёт правую часть в скобки; обычный RawSQL добавляет
+    вторые, и ``IN ((SELECT ...))`` база читает как одно скалярное
+    значение — совпадает только первая строка подзапроса.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def encode_cursor(created, pk):
+    """Упаковывает ключ (created, id) в непрозрачный токен для URL."""
+    return pack_token(created.isoformat(), pk)
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора. Для битого токена возвращает None."""
+    try:
+        created, pk = unpack_token(token)
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+def keyset_filter(queryset, cursor, backwards=False, keys=CURSOR_KEYS):
+    """Отбирает строки строго после (или до) курсора в порядке ленты.
+
+    Лента отсортирована по убыванию ``keys``, поэтому «после» значит
+    «старше курсора». С ``backwards=True`` строки идут в обратном
+    порядке — от курсора к более новым.
+    """
+    created_field, pk_field = keys
+    if backwards:
+        lookup, ordering = 'gt', keys
+    else:
+        lookup, ordering = 'lt', tuple(f'-{key}' for key in keys)
+    if cursor is not None:
+        created, pk = cursor
+        queryset = queryset.filter(
+            Q(**{f'{created_field}__{lookup}': created})
+            | Q(**{created_field: created, f'{pk_field}__{lookup}': pk})
+        )
+    return queryset.order_by(*ordering)
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу (created, id) без OFFSET и COUNT(*).
+
+    Вместо номера страницы принимает непрозрачные курсоры ``after`` и
+    ``before``, поэтому любая страница стоит одного запроса по индексу
+    с LIMIT, как и первая.
+    """
+
+    def __init__(self, object_list, per_page, after=None, before=None,
+                 keys=CURSOR_KEYS):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.before = self.parse_cursor(before)
+        self.after = None if self.before else self.parse_cursor(after)
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def parse_cursor(self, token):
+        return decode_cursor(token)
+
+    def cursor_for(self, row):
+        created_field, pk_field = self.keys
+        return encode_cursor(getattr(row, created_field),
+                             getattr(row, pk_field))
+
+    def _fetch(self, cursor, backwards):
+        queryset = keyset_filter(self.object_list, cursor, backwards,
+                                 self.keys)
+        return list(queryset[:self.per_page + 1])
+
+    def page(self, number=1):
+        backwards = self.before is not None
+        rows = self._fetch(self.before if backwards else self.after,
+                           backwards)
+        has_more = len(rows) > self.per_page
+        if backwards and not has_more:
+            # Дошли до начала ленты: показываем полную первую страницу.
+            backwards, self.before = False, None
+            rows = self._fetch(None, False)
+            has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_newer, has_older = has_more, True
+        else:
+            has_newer, has_older = self.after is not None, has_more
+        if rows and has_newer:
+            self.previous_cursor = self.cursor_for(rows[0])
+        if rows and has_older:
+            self.next_cursor = self.cursor_for(rows[-1])
+        return Page(rows, number, self)
 
 
-def page_maker(request, posts):
-    paginator = Paginator(posts, QUANTTIY_OF_POSTS)
-    page_nuber = request.GET.get('page')
-    page_obj = paginator.get_page(page_nuber)
-    return page_obj
+def page_maker(request, posts, keys=CURSOR_KEYS,
+               per_page=QUANTTIY_OF_POSTS):
+    paginator = CursorPaginator(posts, per_page,
+                                after=request.GET.get('after'),
+                                before=request.GET.get('before'),
+                                keys=keys)
+    return paginator.page()
@@ -1,19 +1,31 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
 
-from .models import Post, Group, User, Follow
+from core.ratelimit import rate_limit
+
+from .models import Comment, Post, Group, User, Follow
 from .forms import PostForm, CommentForm
-from .utils import page_maker
+from .utils import QUANTTIY_OF_POSTS, page_maker
+from . import thumbnails
+from .cache import feed_cache
+from .export import CONTENT_TYPES, EXPORTS, export_stream
+from .feed import feed_page
+from .graph import suggested_authors
+from .search import SearchPaginator, filter_posts, fts_available
+from .stats import get_stats
+from .threads import attach_replies, subtree_page
 
 
-@cache_page(20, key_prefix='index_page')
 def index(request):
     templates = 'posts/index.html'
-    posts = Post.objects.all()
-    page_obj = page_maker(request, posts)
+    posts = Post.objects.select_related('author', 'group')
     context = {
-        'page_obj': page_obj
+        'page_obj': lazy_page(request, posts),
+        'feed_cache': feed_cache(request, 'index'),
     }
     return render(request, templates, context)
 
@@ -21,11 +33,11 @@ def index(request):
 def group_posts(request, slug):
     templates = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts_of_group.all()
-    page_obj = page_maker(request, posts)
+    posts = group.posts_of_group.select_related('author', 'group')
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': lazy_page(request, posts),
+        'feed_cache': feed_cache(request, f'group:{slug}'),
     }
     return render(request, templates, context)
 
@@ -33,9 +45,9 @@ def group_posts(request, slug):
 def profile(request, username):
     templates = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
-    posts = author.posts_of_author.all()
-    posts_quantity = author.posts_of_author.count()
-    page_obj = page_maker(request, posts)
+    posts = author.posts_of_author.select_related('author', 'group')
+    posts_quantity = get_stats(author.id).posts
+    page_obj = lazy_page(request, posts)
     user = request.user
     following = Follow.objects.filter(user_id=user.id,
                                       author_id=author.id).exists()
@@ -44,16 +56,44 @@ def profile(request, username):
         'page_obj': page_obj,
         'quantity': posts_quantity,
         'following': following,
+        'suggested': suggested_authors(user),
+        'feed_cache': feed_cache(request, f'profile:{username}'),
+    }
+    return render(request, templates, context)
+
+
+def lazy_page(request, posts):
+    """Страница ленты, которая читается из базы только при промахе кэша."""
+    return SimpleLazyObject(lambda: page_maker(request, posts))
+
+
+def post_search(request):
+    templates = 'posts/search.html'
+    query = request.GET.get('q', '')
+    if fts_available():
+        paginator = SearchPaginator(query, QUANTTIY_OF_POSTS,
+                                    after=request.GET.get('after'),
+                                    before=request.GET.get('before'))
+        page_obj = paginator.page()
+    else:
+        posts = filter_posts(Post.objects.select_related('author', 'group'),
+                             query)
+        page_obj = page_maker(request, posts)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
     }
     return render(request, templates, context)
 
 
 def post_detail(request, post_id):
     templates = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    posts_quantity = post.author.posts_of_author.count()
+    post = get_object_or_404(Post.objects.select_related('author', 'group'),
+                             id=post_id)
+    posts_quantity = get_stats(post.author_id).posts
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = thread_page(request, post)
     context = {
         'post': post,
         'quantity': posts_quantity,
@@ -63,7 +103,43 @@ def post_detail(request, post_id):
     return render(request, templates, context)
 
 
+def thread_page(request, post):
+    """Страница веток: корневые комментарии и начало ответов на них."""
+    roots = post.comments.filter(depth=0).select_related('author')
+    comments = page_maker(request, roots)
+    attach_replies(comments)
+    return comments
+
+
+def post_comments(request, post_id):
+    templates = 'posts/includes/comments.html'
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'post': post,
+        'comments': thread_page(request, post),
+    }
+    return render(request, templates, context)
+
+
+def comment_thread(request, post_id, comment_id):
+    templates = 'posts/includes/thread.html'
+    comment = get_object_or_404(Comment.objects.select_related('post'),
+                                id=comment_id, post_id=post_id)
+    after = request.GET.get('after', '')
+    # Продолжение ветки после уже показанных ответов.
+    replies, next_after = subtree_page(comment,
+                                       after if after.isdigit() else '')
+    context = {
+        'post': comment.post,
+        'comment': comment,
+        'replies': replies,
+        'next_after': next_after,
+    }
+    return render(request, templates, context)
+
+
 @login_required
+@rate_limit('post_create')
 def post_create(request):
     templates = 'posts/post_create.html'
     form = PostForm(request.POST or None,
@@ -73,6 +149,7 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            thumbnails.schedule(post)
             return redirect('posts:profile', post.author)
     return render(request, templates, {'form': form})
 
@@ -91,13 +168,16 @@ def post_edit(request, post_id):
     }
     if request.user == post.author:
         if form.is_valid() and request.method == 'POST':
-            form.save()
+            post = form.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post)
             return redirect('posts:post_detail', post.pk)
         return render(request, templates, context)
     return render(request, 'posts:post_detail', context)
 
 
 @login_required
+@rate_limit('add_comment')
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     post = get_object_or_404(Post, pk=post_id)
@@ -105,6 +185,10 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        parent_id = request.POST.get('parent', '')
+        if parent_id.isdigit():
+            comment.parent = Comment.objects.filter(id=parent_id,
+                                                    post=post).first()
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
@@ -112,22 +196,15 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     templates = 'posts/follow.html'
-    user = get_object_or_404(User, username=request.user.username)
-    following = Follow.objects.filter(user_id=user.id)
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = page_maker(request, posts)
-    if following:
-        context = {
-            'page_obj': page_obj,
-        }
-    else:
-        context = {
-            'page_obj': [],
-        }
+    context = {
+        'page_obj': feed_page(request, request.user),
+        'suggested': suggested_authors(request.user),
+    }
     return render(request, templates, context)
 
 
 @login_required
+@rate_limit('profile_follow', methods=('GET', 'POST'))
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
@@ -142,3 +219,21 @@ def profile_unfollow(request, username):
     user = request.user
     Follow.objects.filter(user=user, author=author).delete()
     return redirect('posts:follow_index')
+
+
+@staff_member_required
+def export_data(request, kind):
+    if kind not in EXPORTS:
+        raise Http404
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in CONTENT_TYPES:
+        export_format = 'ndjson'
+    compress = 'gzip' in request.GET
+    response = StreamingHttpResponse(
+        export_stream(kind, export_format, compress),
+        content_type=('application/gzip' if compress
+                      else CONTENT_TYPES[export_format]),
+    )
+    filename = f'{kind}.{export_format}' + ('.gz' if compress else '')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -62,12 +63,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.querylog.QuerySampleMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.routers.ReplicaMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -101,13 +104,57 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Профиль production: WAL — читатели не ждут писателя; synchronous=NORMAL
+# в WAL не теряет целостности, fsync только на контрольных точках;
+# mmap и кэш страниц по 256 и 64 МБ; писатель ждёт блокировку до 5 с.
+# Соединения живут между запросами, atomic() начинается с BEGIN IMMEDIATE.
+# Включается переменной окружения DATABASE_PROFILE=production.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+DATABASE_PROFILES = {
+    'development': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
-    }
+    },
+    'production': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(
+                f'PRAGMA {name}={value}'
+                for name, value in SQLITE_PRAGMAS.items()),
+        },
+    },
 }
 
+DATABASES = {
+    'default': DATABASE_PROFILES[
+        os.environ.get('DATABASE_PROFILE', 'development')],
+}
+
+# Реплики для чтения: пути к копиям базы через запятую, например
+# DATABASE_REPLICAS=/srv/replica.sqlite3. Локальную копию обновляет
+# команда sync_replicas. В тестах реплики смотрят в тестовую default.
+REPLICA_DATABASES = {
+    f'replica_{number}': dict(DATABASES['default'], NAME=path,
+                              TEST={'MIRROR': 'default'})
+    for number, path in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')))
+}
+DATABASES.update(REPLICA_DATABASES)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -127,11 +174,87 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Общий для процессов кэш — memcached по адресу CACHE_LOCATION (нужен
+# python-memcached). Без него у каждого процесса свой LocMemCache:
+# сброс поколения ленты, жетоны ограничений и прочее видит только
+# процесс, который их записал.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+SHARED_CACHE = bool(CACHE_LOCATION)
+
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION,
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Авторы, у которых подписчиков не меньше порога, не раскладываются
+# по лентам при публикации: их посты подмешиваются при чтении ленты.
+FEED_PULL_THRESHOLD = 10000
+# Обратно к раскладке автор возвращается, только опустившись ниже этой
+# доли порога, и только командой sync_feed_modes: раскладка пропущенного
+# слишком тяжела для запроса.
+FEED_PUSH_RATIO = 0.8
+
+# Списки постов на страницах лент сбрасываются при записи, поэтому с
+# общим кэшем могут жить долго. С LocMemCache соседние процессы сброса
+# не видят, и список устаревает не дольше, чем на это время.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6 if SHARED_CACHE else 60
+
+# Размеры миниатюр постов. Их строит пул процессов после публикации,
+# а шаблоны до готовности показывают заглушку. Пул свой у каждого
+# процесса веб-сервера, поэтому маленький; 0 — строить сразу в запросе.
+# С THUMBNAIL_EXTERNAL веб их не строит вовсе: недостающие достраивает
+# ``pregenerate_thumbnails --missing`` по крону.
+POST_THUMBNAIL_SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
 }
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+THUMBNAIL_EXTERNAL = bool(os.environ.get('THUMBNAIL_EXTERNAL'))
+
+# Сколько записей разрешено одному пользователю (анониму — по адресу)
+# за период: 's', 'm', 'h' или 'd'. Лишние получают 429.
+RATE_LIMITS = {
+    'post_create': '20/m',
+    'add_comment': '30/m',
+    'profile_follow': '60/m',
+}
+
+# Страницы, которые читают с реплики, если она настроена, и модели каких
+# приложений при этом читаются оттуда.
+REPLICA_READ_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:comment_thread',
+    'posts:follow_index',
+)
+REPLICA_READ_APPS = ('posts', 'auth')
+# После этих страниц автор читает только из default, чтобы видеть свои
+# записи. Окно должно быть больше отставания реплики; на столько же
+# кэшируются страницы лент, собранные с реплики.
+REPLICA_STICKY_VIEWS = (
+    'posts:post_create',
+    'posts:post_edit',
+    'posts:add_comment',
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+)
+REPLICA_STICKY_SECONDS = 10
+
+# Доля запросов к сайту, чьи SQL со временем пишутся в журнал для
+# команды advise_indexes. 0 — журнал выключен.
+QUERY_SAMPLE_RATE = float(os.environ.get('QUERY_SAMPLE_RATE', 0))
+QUERY_SAMPLE_LOG = os.path.join(BASE_DIR, 'query_samples.jsonl')
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/